@@ -0,0 +1,238 @@
+"""In-process cache of balances, positions and prices for the futures account.
+
+The cache is seeded over REST and then kept current from the user-data
+websocket, so the trading loop can read account state without a round-trip.
+"""
+import asyncio
+import time
+from decimal import Decimal
+from typing import Dict, Iterable, Optional
+
+
+class PositionState:
+    """One-way-mode position for a symbol."""
+
+    __slots__ = ('symbol', 'amount', 'entry_price', 'unrealized_pnl', 'updated_at')
+
+    def __init__(self, symbol, amount=Decimal('0'), entry_price=0.0, unrealized_pnl=0.0, updated_at=0):
+        self.symbol = symbol
+        self.amount = amount
+        self.entry_price = entry_price
+        self.unrealized_pnl = unrealized_pnl
+        self.updated_at = updated_at  # Exchange time in ms of the last change, 0 if unknown
+
+
+class AccountState:
+    """Account cache updated from REST snapshots and stream events.
+
+    All updates and reads happen on the event loop, so no locking is needed.
+    """
+
+    def __init__(self):
+        self.balances: Dict[str, float] = {}
+        self.positions: Dict[str, PositionState] = {}
+        self.prices: Dict[str, float] = {}
+        self.mark_prices: Dict[str, float] = {}
+        self.open_orders: Dict[int, dict] = {}
+        self.seeded_at: Optional[float] = None
+        self.last_event_at: Optional[float] = None
+        # True while the user-data stream is connected and caught up, so stream events keep the cache current
+        self.live = False
+        # Orders whose fill is already reflected in positions, so a fill is never counted twice;
+        # order id -> change number when it was counted
+        self._counted_orders: Dict[int, int] = {}
+        # Every stream event or fill applied bumps the change number; entries remember the number
+        # of their last change, so a REST snapshot never overwrites something newer than itself
+        self._changes = 0
+        self._changed: Dict[tuple, int] = {}
+
+    # ------------------------------------------------------------------
+    # REST seeding / reconciliation
+    # ------------------------------------------------------------------
+    async def seed(self, client, symbols: Iterable[str]) -> None:
+        """Replace the cached state with a fresh REST snapshot, fetched concurrently.
+
+        Balances, positions and orders changed by a stream event or fill while
+        the snapshot was being fetched keep their cached value, which is at
+        least as new as the snapshot's.
+        """
+        symbols = list(symbols)
+        started = self._changes
+        balances, positions, open_orders, *tickers = await asyncio.gather(
+            client.futures_account_balance(),
+            client.futures_position_information(),
+            client.futures_get_open_orders(),
+            *(client.futures_symbol_ticker(symbol=symbol) for symbol in symbols)
+        )
+
+        balances = {b['asset']: float(b['balance']) for b in balances}
+        positions = {
+            p['symbol']: PositionState(
+                p['symbol'],
+                Decimal(p['positionAmt']),
+                float(p['entryPrice']),
+                float(p['unRealizedProfit']),
+                int(p.get('updateTime', 0))
+            )
+            for p in positions if p.get('positionSide', 'BOTH') == 'BOTH'
+        }
+        open_orders = {int(o['orderId']): o for o in open_orders}
+        for kind, cached, snapshot in (('balance', self.balances, balances),
+                                       ('position', self.positions, positions),
+                                       ('order', self.open_orders, open_orders)):
+            for key in set(cached) | set(snapshot):
+                if self._changed.get((kind, key), 0) > started:
+                    # Changed after the snapshot was requested: keep the cached value, or its absence
+                    if key in cached:
+                        snapshot[key] = cached[key]
+                    else:
+                        snapshot.pop(key, None)
+        self.balances = balances
+        self.positions = positions
+        self.open_orders = open_orders
+        for symbol, ticker in zip(symbols, tickers):
+            self.prices[symbol] = float(ticker['price'])
+        # Fills counted before the snapshot are in it; keep the ones counted since
+        self._counted_orders = {order_id: change for order_id, change in self._counted_orders.items()
+                                if change > started}
+        self._changed = {key: change for key, change in self._changed.items() if change > started}
+        self.seeded_at = time.time()
+
+    # ------------------------------------------------------------------
+    # Stream updates
+    # ------------------------------------------------------------------
+    def apply_event(self, event: dict) -> None:
+        """Apply a user-data stream event; unknown event types are ignored."""
+        event_type = event.get('e')
+        if event_type == 'ACCOUNT_UPDATE':
+            self._apply_account_update(event)
+        elif event_type == 'ORDER_TRADE_UPDATE':
+            self._apply_order_update(event)
+
+    def _changing(self, kind: str, key) -> None:
+        self._changed[(kind, key)] = self._changes
+
+    def _apply_account_update(self, event: dict) -> None:
+        self._changes += 1
+        event_time = int(event.get('E', 0))
+        update = event['a']
+        for balance in update.get('B', []):
+            self.balances[balance['a']] = float(balance['wb'])
+            self._changing('balance', balance['a'])
+        for position in update.get('P', []):
+            if position.get('ps', 'BOTH') != 'BOTH':
+                continue
+            symbol = position['s']
+            current = self.positions.get(symbol)
+            if current is not None and current.updated_at > event_time:
+                continue  # Stale event delivered out of order
+            self.positions[symbol] = PositionState(
+                symbol,
+                Decimal(position['pa']),
+                float(position['ep']),
+                float(position['up']),
+                event_time
+            )
+            self._changing('position', symbol)
+        self.last_event_at = time.time()
+
+    def _apply_order_update(self, event: dict) -> None:
+        self._changes += 1
+        order = event['o']
+        order_id = int(order['i'])
+        self._changing('order', order_id)
+        if order['X'] in ('NEW', 'PARTIALLY_FILLED'):
+            self.open_orders[order_id] = {
+                'orderId': order_id,
+                'symbol': order['s'],
+                'side': order['S'],
+                'type': order['o'],
+                'origQty': order['q'],
+                'stopPrice': order['sp'],
+                'status': order['X'],
+            }
+        else:
+            self.open_orders.pop(order_id, None)
+        if float(order['z']) > 0:
+            # The matching ACCOUNT_UPDATE carries the new position amount
+            self._counted_orders[order_id] = self._changes
+        self.last_event_at = time.time()
+
+    def apply_fill(self, symbol: str, order_id: int, side: str, quantity: Decimal,
+                   price: Optional[float] = None, fill_time: int = 0) -> None:
+        """Reflect our own fill straight from the REST order response.
+
+        The user-data stream usually confirms a fill after the REST call
+        returns; applying it here lets the next reader see the new position
+        immediately. Fills already reported by the stream, or already in a
+        position updated at or after ``fill_time`` (exchange ms), are skipped.
+        """
+        if order_id in self._counted_orders:
+            return
+        self._changes += 1
+        self._counted_orders[order_id] = self._changes
+        position = self.positions.setdefault(symbol, PositionState(symbol))
+        if fill_time and position.updated_at >= fill_time:
+            return
+        self._changing('position', symbol)
+        position.updated_at = max(position.updated_at, fill_time)
+        previous = position.amount
+        position.amount += quantity if side == 'BUY' else -quantity
+        if not position.amount:
+            position.entry_price = 0.0
+        elif price and (not previous or (previous > 0) != (position.amount > 0)):
+            # Opened from flat or flipped sides: the fill price is the new entry
+            position.entry_price = price
+
+    def add_open_order(self, order: dict) -> None:
+        """Cache an order we just placed, from its REST response, ahead of the stream's confirmation."""
+        self._changes += 1
+        order_id = int(order['orderId'])
+        self.open_orders[order_id] = order
+        self._changing('order', order_id)
+
+    def set_price(self, symbol: str, price: float) -> None:
+        self.prices[symbol] = price
+
+    def set_mark_price(self, symbol: str, price: float) -> None:
+        self.mark_prices[symbol] = price
+
+    # ------------------------------------------------------------------
+    # Readers
+    # ------------------------------------------------------------------
+    def balance(self, asset: str = 'USDT') -> float:
+        return self.balances.get(asset, 0.0)
+
+    def position(self, symbol: str) -> Optional[PositionState]:
+        position = self.positions.get(symbol)
+        if position is None:
+            return None
+        return PositionState(symbol, position.amount, position.entry_price,
+                             position.unrealized_pnl, position.updated_at)
+
+    def position_amount(self, symbol: str) -> Decimal:
+        position = self.positions.get(symbol)
+        return position.amount if position else Decimal('0')
+
+    def price(self, symbol: str) -> Optional[float]:
+        return self.prices.get(symbol)
+
+    def mark_price(self, symbol: str) -> Optional[float]:
+        """Latest streamed mark price, or the last trade price before the first mark price update."""
+        return self.mark_prices.get(symbol, self.prices.get(symbol))
+
+    def is_fresh(self, max_age: float) -> bool:
+        """True if the cache is kept live by the stream or was seeded less than ``max_age`` seconds ago."""
+        if self.seeded_at is None:
+            return False
+        return self.live or time.time() - self.seeded_at < max_age
+
+    def unrealized_pnl(self, symbol: str) -> float:
+        """Unrealized PnL marked to the latest mark price, as the exchange computes it."""
+        position = self.position(symbol)
+        price = self.mark_price(symbol)
+        if position is None or not position.amount:
+            return 0.0
+        if price is None or not position.entry_price:
+            return position.unrealized_pnl
+        return (price - position.entry_price) * float(position.amount)
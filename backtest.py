@@ -0,0 +1,274 @@
+"""Replay the live moving-average strategy over historical klines.
+
+Mirrors ``run_strategy`` / ``place_stop_loss`` in main.py bar by bar:
+
+* once ``long_window`` candles have closed, a flat account opens in the
+  direction of the signal (long if short MA > long MA, else short) at the close;
+* when the signal flips the position is reversed at the close;
+* every entry places a reduce-only stop ``stop_loss_percentage`` away from the
+  signal price; a stopped-out account re-enters on the next close, exactly as
+  the live bot does when it finds itself flat.
+
+Signals are computed with NumPy over the whole series. The fill simulator only
+loops once per trade, searching each holding period for a stop hit with array
+operations, so years of 1m data run in seconds.
+
+Usage:
+
+    python backtest.py klines.csv [--short-window 7] [--long-window 30] ...
+"""
+import argparse
+import os
+import time
+from typing import Dict, Optional
+
+import numpy as np
+
+KLINE_COLUMNS = ['open_time', 'open', 'high', 'low', 'close', 'volume', 'close_time',
+                 'quote_volume', 'count', 'taker_buy_volume', 'taker_buy_quote_volume', 'ignore']
+PRICE_COLUMNS = ['open_time', 'open', 'high', 'low', 'close']
+
+
+def load_klines(path: str) -> Dict[str, np.ndarray]:
+    """Load klines from a CSV or Parquet file, or a kline store directory, into float64 column arrays.
+
+    CSVs may be Binance kline dumps with or without the header row; any file
+    needs at least ``open_time`` and ``close``. Missing open/high/low columns
+    fall back to the close price. Reading Parquet needs pyarrow installed.
+    A directory written by ``kline_store.KlineStore`` (e.g. klines/LTCUSDT/5m)
+    is memory-mapped, so its price columns are used without parsing or copying.
+    """
+    if os.path.isdir(path):
+        from kline_store import KlineStore
+
+        # Read-only: the bot may be appending to the same store
+        columns = KlineStore.open_readonly(path).read()
+        return {name: columns[name].astype(np.float64, copy=False) for name in PRICE_COLUMNS}
+
+    import pandas as pd
+
+    if path.endswith('.parquet'):
+        frame = pd.read_parquet(path)
+    else:
+        with open(path) as f:
+            first_line = f.readline()
+        fields = first_line.split(',')
+        if fields[0].strip().replace('.', '', 1).isdigit():
+            # Headerless Binance dump
+            frame = pd.read_csv(path, header=None, names=KLINE_COLUMNS[:len(fields)])
+        else:
+            frame = pd.read_csv(path)
+
+    if 'close' not in frame.columns:
+        raise ValueError(f"{path} has no 'close' column")
+    columns = {}
+    for name in PRICE_COLUMNS:
+        source = name if name in frame.columns else 'close'
+        columns[name] = frame[source].to_numpy(dtype=np.float64)
+    return columns
+
+
+def price_prefix_sums(close: np.ndarray) -> np.ndarray:
+    """Prefix sums of close prices; ``rolling_mean`` reads any window from them in O(n)."""
+    prefix = np.empty(len(close) + 1, dtype=np.float64)
+    prefix[0] = 0.0
+    np.cumsum(close, out=prefix[1:])
+    return prefix
+
+
+def rolling_mean(prefix: np.ndarray, window: int) -> np.ndarray:
+    """Simple moving average per bar, NaN until ``window`` values are available."""
+    count = len(prefix) - 1
+    result = np.full(count, np.nan)
+    if window <= count:
+        result[window - 1:] = (prefix[window:] - prefix[:-window]) / window
+    return result
+
+
+def crossover_signals(prefix: np.ndarray, short_window: int, long_window: int) -> np.ndarray:
+    """+1 (long) / -1 (short) per bar, 0 until the long window has filled."""
+    return signals_from_averages(rolling_mean(prefix, short_window), rolling_mean(prefix, long_window), long_window)
+
+
+def signals_from_averages(short_ma: np.ndarray, long_ma: np.ndarray, long_window: int) -> np.ndarray:
+    signals = np.where(short_ma > long_ma, 1, -1).astype(np.int8)
+    signals[:long_window - 1] = 0
+    return signals
+
+
+class BacktestResult:
+    """Trades and summary statistics of one backtest run."""
+
+    def __init__(self, entry_index, exit_index, direction, entry_price, exit_price,
+                 stopped, returns, equity, initial_balance, bars):
+        self.entry_index = entry_index
+        self.exit_index = exit_index
+        self.direction = direction
+        self.entry_price = entry_price
+        self.exit_price = exit_price
+        self.stopped = stopped
+        self.returns = returns  # Per-trade return on account balance
+        self.equity = equity  # Balance after each trade
+        self.initial_balance = initial_balance
+        self.bars = bars
+
+    @property
+    def trade_count(self) -> int:
+        return len(self.returns)
+
+    @property
+    def final_balance(self) -> float:
+        return float(self.equity[-1]) if len(self.equity) else self.initial_balance
+
+    @property
+    def max_drawdown(self) -> float:
+        """Largest peak-to-trough fall of the closed-trade equity curve, as a fraction."""
+        if not len(self.equity):
+            return 0.0
+        curve = np.concatenate(([self.initial_balance], self.equity))
+        peaks = np.maximum.accumulate(curve)
+        return float(np.max(1 - curve / peaks))
+
+    def summary(self) -> dict:
+        wins = int(np.count_nonzero(self.returns > 0))
+        return {
+            'bars': self.bars,
+            'trades': self.trade_count,
+            'long_trades': int(np.count_nonzero(self.direction > 0)),
+            'short_trades': int(np.count_nonzero(self.direction < 0)),
+            'stop_losses': int(np.count_nonzero(self.stopped)),
+            'win_rate_pct': 100 * wins / self.trade_count if self.trade_count else 0.0,
+            'final_balance': self.final_balance,
+            'pnl': self.final_balance - self.initial_balance,
+            'return_pct': 100 * (self.final_balance / self.initial_balance - 1),
+            'max_drawdown_pct': 100 * self.max_drawdown,
+        }
+
+
+def simulate_trades(klines: Dict[str, np.ndarray], signals: np.ndarray, stop_loss_percentage: float,
+                    slippage_bps: float = 0.0):
+    """Walk the signal series and return per-trade arrays.
+
+    Market fills (entries, reversals) happen at the bar close; stops fill at
+    the stop price, or at the open if the bar gapped through it. Slippage is
+    applied against us on every fill. A position still open at the end is
+    closed at the last close.
+    """
+    close, high, low, open_ = klines['close'], klines['high'], klines['low'], klines['open']
+    bars = len(close)
+    stop_loss = stop_loss_percentage / 100
+    slippage = slippage_bps / 10_000
+
+    active = np.flatnonzero(signals)
+    if not len(active):
+        empty = np.empty(0)
+        return empty.astype(np.int64), empty.astype(np.int64), empty.astype(np.int8), empty, empty, empty.astype(bool)
+    first = active[0]
+    flips = first + 1 + np.flatnonzero(signals[first + 1:] != signals[first:-1])
+    boundaries = np.concatenate(([first], flips, [bars - 1]))
+
+    entries, exits, directions, entry_prices, exit_prices, stopped = [], [], [], [], [], []
+    for segment in range(len(boundaries) - 1):
+        entry, end = int(boundaries[segment]), int(boundaries[segment + 1])
+        direction = int(signals[entry])
+        while entry < end:
+            signal_price = close[entry]
+            fill = signal_price * (1 + direction * slippage)
+            if direction > 0:
+                stop_price = signal_price * (1 - stop_loss)
+                hits = low[entry + 1:end + 1] <= stop_price
+            else:
+                stop_price = signal_price * (1 + stop_loss)
+                hits = high[entry + 1:end + 1] >= stop_price
+
+            entries.append(entry)
+            directions.append(direction)
+            entry_prices.append(fill)
+            if hits.any():
+                hit = entry + 1 + int(np.argmax(hits))
+                # A gap through the stop fills at the open
+                trigger = min(stop_price, open_[hit]) if direction > 0 else max(stop_price, open_[hit])
+                exits.append(hit)
+                exit_prices.append(trigger * (1 - direction * slippage))
+                stopped.append(True)
+                entry = hit  # Flat after the stop, re-enter at this bar's close
+            else:
+                exits.append(end)
+                exit_prices.append(close[end] * (1 - direction * slippage))
+                stopped.append(False)
+                entry = end
+
+    return (np.array(entries, dtype=np.int64), np.array(exits, dtype=np.int64),
+            np.array(directions, dtype=np.int8), np.array(entry_prices), np.array(exit_prices),
+            np.array(stopped, dtype=bool))
+
+
+def score_trades(trades, bars: int, leverage: float = 10, account_usage_percentage: float = 95,
+                 fee_rate: float = 0.0004, initial_balance: float = 1000.0) -> BacktestResult:
+    """Turn ``simulate_trades`` output into balance returns for one sizing setup."""
+    entry_index, exit_index, direction, entry_price, exit_price, stopped = trades
+
+    # Every entry is sized from the current balance, like calculate_position_size
+    exposure = account_usage_percentage / 100 * leverage
+    price_change = exit_price / entry_price
+    returns = exposure * (direction * (price_change - 1) - fee_rate * (1 + price_change))
+    # Losing more than the margin liquidates the account
+    growth = np.maximum(1 + returns, 0.0)
+    equity = initial_balance * np.cumprod(growth)
+
+    return BacktestResult(entry_index, exit_index, direction, entry_price, exit_price,
+                          stopped, returns, equity, initial_balance, bars)
+
+
+def run_backtest(klines: Dict[str, np.ndarray], short_window: int = 7, long_window: int = 30,
+                 leverage: float = 10, stop_loss_percentage: float = 2,
+                 account_usage_percentage: float = 95, fee_rate: float = 0.0004,
+                 slippage_bps: float = 1.0, initial_balance: float = 1000.0,
+                 prefix: Optional[np.ndarray] = None) -> BacktestResult:
+    """Backtest one parameter set. Pass ``prefix`` to reuse precomputed price prefix sums."""
+    if prefix is None:
+        prefix = price_prefix_sums(klines['close'])
+    signals = crossover_signals(prefix, short_window, long_window)
+    trades = simulate_trades(klines, signals, stop_loss_percentage, slippage_bps)
+    return score_trades(trades, len(klines['close']), leverage, account_usage_percentage,
+                        fee_rate, initial_balance)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest the moving-average crossover strategy")
+    parser.add_argument('path', help="kline CSV or Parquet file, or a kline store directory")
+    parser.add_argument('--short-window', type=int, default=7)
+    parser.add_argument('--long-window', type=int, default=30)
+    parser.add_argument('--leverage', type=float, default=10)
+    parser.add_argument('--stop-loss', type=float, default=2, help="stop loss percentage")
+    parser.add_argument('--account-usage', type=float, default=95, help="percentage of balance per entry")
+    parser.add_argument('--fee-rate', type=float, default=0.0004, help="taker fee per fill, as a fraction")
+    parser.add_argument('--slippage-bps', type=float, default=1.0)
+    parser.add_argument('--balance', type=float, default=1000.0, help="initial USDT balance")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    klines = load_klines(args.path)
+    loaded = time.perf_counter()
+    result = run_backtest(
+        klines,
+        short_window=args.short_window,
+        long_window=args.long_window,
+        leverage=args.leverage,
+        stop_loss_percentage=args.stop_loss,
+        account_usage_percentage=args.account_usage,
+        fee_rate=args.fee_rate,
+        slippage_bps=args.slippage_bps,
+        initial_balance=args.balance
+    )
+    finished = time.perf_counter()
+
+    print(f"Backtest {os.path.basename(args.path)}: {args.short_window}/{args.long_window} MA, "
+          f"{args.leverage}x, stop loss {args.stop_loss}%")
+    for key, value in result.summary().items():
+        print(f"  {key:<18} {value:,.2f}" if isinstance(value, float) else f"  {key:<18} {value:,}")
+    print(f"  load {loaded - start:.2f}s, simulate {finished - loaded:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
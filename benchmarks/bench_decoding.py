@@ -0,0 +1,104 @@
+"""Compare websocket frame decoding backends against the old json.loads path.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_decoding [--frames 200000] [--capture frames.txt]
+
+``--capture`` takes a file of raw combined-stream frames, one per line
+(optionally gzipped); without it a synthetic mix of kline pushes and
+subscription replies is used.
+"""
+import argparse
+import gzip
+import json
+import random
+import time
+
+from decoding import FrameDecoder, available_backends
+
+STREAMS = ['ltcusdt@kline_5m', 'btcusdt@kline_1m', 'ethusdt@kline_15m']
+
+
+def make_frames(count, seed=42):
+    rng = random.Random(seed)
+    frames = []
+    price = 100.0
+    open_time = 1_700_000_000_000
+    for i in range(count):
+        if i % 100 == 0:
+            frames.append(json.dumps({'result': None, 'id': i}, separators=(',', ':')))
+            continue
+        price *= 1 + rng.gauss(0, 0.0005)
+        stream = rng.choice(STREAMS)
+        symbol = stream.split('@')[0].upper()
+        kline = {
+            't': open_time, 'T': open_time + 299_999, 's': symbol, 'i': '5m', 'f': 100, 'L': 200,
+            'o': f"{price:.2f}", 'c': f"{price:.2f}", 'h': f"{price * 1.001:.2f}", 'l': f"{price * 0.999:.2f}",
+            'v': f"{rng.uniform(1, 1000):.3f}", 'n': 100, 'x': i % 50 == 0, 'q': f"{rng.uniform(1, 1e5):.4f}",
+            'V': '500.000', 'Q': '50000.0000', 'B': '0',
+        }
+        frames.append(json.dumps({'stream': stream, 'data': {'e': 'kline', 'E': open_time + i, 's': symbol,
+                                                             'k': kline}}, separators=(',', ':')))
+    return frames
+
+
+def load_capture(path):
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt') as f:
+        return [line.rstrip('\n') for line in f if line.strip()]
+
+
+def run_stdlib_dict(frames):
+    """The original on_message: json.loads, dict lookups, float conversions per frame."""
+    closes = 0.0
+    for frame in frames:
+        payload = json.loads(frame)
+        if 'stream' not in payload:
+            continue
+        data = payload['data']
+        if 'k' not in data:
+            continue
+        k = data['k']
+        closes += float(k['c'])
+        int(k['t']), int(k['T']), float(k['o']), float(k['h']), float(k['l']), float(k['v']), bool(k['x'])
+    return closes
+
+
+def run_decoder(decoder):
+    def run(frames):
+        closes = 0.0
+        decode_kline = decoder.decode_kline
+        for frame in frames:
+            kline = decode_kline(frame)
+            if kline is not None:
+                closes += kline.close
+        return closes
+    return run
+
+
+def timed(func, frames):
+    start = time.perf_counter()
+    result = func(frames)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--frames', type=int, default=200_000)
+    parser.add_argument('--capture', help="file of recorded frames, one per line")
+    args = parser.parse_args()
+
+    frames = load_capture(args.capture) if args.capture else make_frames(args.frames)
+    baseline_time, baseline = timed(run_stdlib_dict, frames)
+    print(f"frames: {len(frames)}")
+    print(f"{'json.loads + dicts':<22} {baseline_time:.3f}s total, {baseline_time / len(frames) * 1e6:.2f}us/frame")
+    for backend in available_backends():
+        elapsed, result = timed(run_decoder(FrameDecoder(backend)), frames)
+        if abs(result - baseline) > 1e-6 * abs(baseline):
+            raise SystemExit(f"{backend} decoded different prices: {result} != {baseline}")
+        print(f"{'FrameDecoder ' + backend:<22} {elapsed:.3f}s total, {elapsed / len(frames) * 1e6:.2f}us/frame, "
+              f"{baseline_time / elapsed:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Compare the streaming MA engine against the old per-tick pandas path.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_indicators [--ticks 20000]
+"""
+import argparse
+import random
+import time
+
+import pandas as pd
+
+from indicators import MovingAverageEngine
+
+SHORT_WINDOW = 7
+LONG_WINDOW = 30
+
+
+def make_prices(count, seed=42):
+    rng = random.Random(seed)
+    price = 100.0
+    prices = []
+    for _ in range(count):
+        price *= 1 + rng.gauss(0, 0.001)
+        prices.append(price)
+    return prices
+
+
+def run_pandas(ticks):
+    """The original on_message logic: list re-slice plus two rolling means."""
+    prices = []
+    result = None
+    for price in ticks:
+        prices.append(price)
+        if len(prices) > LONG_WINDOW:
+            prices = prices[-LONG_WINDOW:]
+        if len(prices) >= LONG_WINDOW:
+            df = pd.Series(prices)
+            short_ma = df.rolling(window=SHORT_WINDOW, min_periods=1).mean().iloc[-1]
+            long_ma = df.rolling(window=LONG_WINDOW, min_periods=1).mean().iloc[-1]
+            result = (short_ma, long_ma)
+    return result
+
+
+def run_engine(ticks):
+    engine = MovingAverageEngine(SHORT_WINDOW, LONG_WINDOW)
+    result = None
+    for price in ticks:
+        engine.update(price)
+        if engine.ready:
+            result = (engine.short_ma, engine.long_ma)
+    return result
+
+
+def timed(func, ticks):
+    start = time.perf_counter()
+    result = func(ticks)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ticks', type=int, default=20_000)
+    args = parser.parse_args()
+
+    ticks = make_prices(args.ticks)
+    pandas_time, pandas_result = timed(run_pandas, ticks)
+    engine_time, engine_result = timed(run_engine, ticks)
+
+    if abs(pandas_result[0] - engine_result[0]) > 1e-9 or abs(pandas_result[1] - engine_result[1]) > 1e-9:
+        raise SystemExit(f"Results differ: pandas={pandas_result} engine={engine_result}")
+
+    print(f"ticks:  {args.ticks}")
+    print(f"pandas: {pandas_time:.3f}s total, {pandas_time / args.ticks * 1e6:.1f}us/tick")
+    print(f"engine: {engine_time:.3f}s total, {engine_time / args.ticks * 1e6:.2f}us/tick")
+    print(f"speedup: {pandas_time / engine_time:.0f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Measure how long the bot takes to import and to get a REST client ready.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_startup [--runs 5] [--breakdown 15]
+
+Every measurement runs in a fresh interpreter, so nothing is cached in
+``sys.modules``. Reported: ``import main`` on its own, ``import main`` plus
+creating the Binance client (python-binance is imported on first use), the
+same with every heavy dependency imported up front as before, and each heavy
+dependency alone. ``--breakdown N`` adds the N slowest modules of
+``import main`` according to ``python -X importtime``.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+HEAVY_MODULES = ['binance', 'telegram.ext', 'aiohttp', 'aiohttp.web', 'numpy', 'pandas']
+
+# Each snippet prints the seconds spent in the timed section
+SNIPPETS = {
+    'import main': """
+import time
+started = time.perf_counter()
+import main
+print(time.perf_counter() - started)
+main.log_listener.stop()
+""",
+    'import main + client': """
+import asyncio, time
+started = time.perf_counter()
+import main
+asyncio.run(main.create_binance_client())
+print(time.perf_counter() - started)
+main.log_listener.stop()
+""",
+    'eager imports + client': """
+import asyncio, time
+started = time.perf_counter()
+import binance, telegram.ext, aiohttp.web
+import main
+asyncio.run(main.create_binance_client())
+print(time.perf_counter() - started)
+main.log_listener.stop()
+""",
+}
+
+
+def run_snippet(code, env):
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, env=env, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def import_breakdown(env, top):
+    code = "import main; main.log_listener.stop()"
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            capture_output=True, text=True, env=env, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        rows.append((int(cumulative), name.rstrip()))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--breakdown', type=int, default=0, metavar='N')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Keep the bot's log out of the working directory
+        env = dict(os.environ, LOG_FILE=os.path.join(tmp, 'bench.log'), PYTHONPATH=os.getcwd())
+        snippets = dict(SNIPPETS)
+        for module in HEAVY_MODULES:
+            snippets[f"import {module}"] = (f"import time\nstarted = time.perf_counter()\nimport {module}\n"
+                                            f"print(time.perf_counter() - started)\n")
+
+        print(f"median of {args.runs} fresh interpreters")
+        for label, code in snippets.items():
+            try:
+                times = [run_snippet(code, env) for _ in range(args.runs)]
+            except subprocess.CalledProcessError:
+                print(f"{label:<26} not available")
+                continue
+            print(f"{label:<26} {statistics.median(times) * 1000:8.1f} ms")
+
+        if args.breakdown:
+            print("\nslowest modules imported by main (cumulative):")
+            for cumulative, name in import_breakdown(env, args.breakdown):
+                print(f"{cumulative / 1000:8.1f} ms  {name}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Aggregate kline websocket pushes into one bar per open time."""
+from typing import List, Optional
+
+# Kline interval units in milliseconds, as used in Binance interval names ('1m', '4h', ...)
+INTERVAL_UNIT_MS = {'s': 1000, 'm': 60_000, 'h': 3_600_000, 'd': 86_400_000, 'w': 604_800_000}
+
+
+def interval_to_milliseconds(interval: str) -> int:
+    """Length of a kline interval such as '5m' in milliseconds (without importing python-binance)."""
+    return int(interval[:-1]) * INTERVAL_UNIT_MS[interval[-1]]
+
+
+class Candle:
+    """A single kline bar, updated in place while it is open."""
+
+    __slots__ = ('open_time', 'close_time', 'open', 'high', 'low', 'close', 'volume', 'closed')
+
+    def __init__(self, open_time, close_time, open, high, low, close, volume, closed=False):
+        self.open_time = open_time
+        self.close_time = close_time
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+        self.closed = closed
+
+    @classmethod
+    def from_kline(cls, kline) -> 'Candle':
+        """Build from a decoded kline push (``decoding.KlineEvent``)."""
+        return cls(kline.open_time, kline.close_time, kline.open, kline.high, kline.low,
+                   kline.close, kline.volume, kline.closed)
+
+    @classmethod
+    def from_rest(cls, row: list) -> 'Candle':
+        """Build a closed bar from a ``futures_klines`` row."""
+        return cls(int(row[0]), int(row[6]), float(row[1]), float(row[2]),
+                   float(row[3]), float(row[4]), float(row[5]), True)
+
+    def update_from_kline(self, kline) -> None:
+        # Every push carries the full bar so far, so overwrite rather than merge
+        self.high = kline.high
+        self.low = kline.low
+        self.close = kline.close
+        self.volume = kline.volume
+        self.closed = kline.closed
+
+    def __repr__(self):
+        return (f"Candle(open_time={self.open_time}, o={self.open}, h={self.high}, "
+                f"l={self.low}, c={self.close}, v={self.volume}, closed={self.closed})")
+
+
+class CandleAggregator:
+    """Keeps the open bar and hands back bars as they close.
+
+    Pushes for the same open time update the current bar in place. A bar is
+    committed when Binance marks it closed (``k.x``), or implicitly when a push
+    for a later open time arrives first. Pushes for bars that were already
+    committed are ignored.
+    """
+
+    def __init__(self):
+        self.current: Optional[Candle] = None
+        self.last_closed: Optional[Candle] = None
+
+    @property
+    def last_closed_open_time(self) -> Optional[int]:
+        return self.last_closed.open_time if self.last_closed else None
+
+    def update(self, kline) -> List[Candle]:
+        """Apply a decoded kline push; returns the bars closed by it (oldest first)."""
+        open_time = kline.open_time
+        if self.last_closed is not None and open_time <= self.last_closed.open_time:
+            return []  # Late or duplicate push for a committed bar
+
+        closed = []
+        current = self.current
+        if current is not None and open_time < current.open_time:
+            return []  # Out-of-order push for an older bar
+        if current is not None and open_time == current.open_time:
+            current.update_from_kline(kline)
+        else:
+            if current is not None:
+                # Missed the closing push of the previous bar
+                current.closed = True
+                closed.append(current)
+                self.last_closed = current
+            current = self.current = Candle.from_kline(kline)
+
+        if current.closed:
+            closed.append(current)
+            self.last_closed = current
+            self.current = None
+        return closed
+
+    def commit(self, candle: Candle) -> bool:
+        """Record a bar closed outside the stream, e.g. from a REST backfill.
+
+        Returns False if the bar is not newer than the last committed one.
+        """
+        if self.last_closed is not None and candle.open_time <= self.last_closed.open_time:
+            return False
+        self.last_closed = candle
+        if self.current is not None and self.current.open_time <= candle.open_time:
+            self.current = None
+        return True
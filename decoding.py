@@ -0,0 +1,117 @@
+"""Websocket frame decoding with the fastest JSON backend available.
+
+msgspec decodes kline frames straight into typed structs, reading only the
+fields we use; orjson is the next best; the stdlib ``json`` module is the
+fallback. Set ``MESSAGE_DECODER`` to ``msgspec``, ``orjson`` or ``json`` to
+pick one explicitly.
+"""
+import json
+import os
+from typing import Optional, Tuple
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Binance sends compact JSON, so this is a reliable test for kline events
+KLINE_MARKER = '"e":"kline"'
+MARK_PRICE_MARKER = '"e":"markPriceUpdate"'
+
+
+class KlineEvent:
+    """The parts of a combined-stream kline push the bot uses, already converted."""
+
+    __slots__ = ('stream', 'event_time', 'open_time', 'close_time', 'open', 'high', 'low',
+                 'close', 'volume', 'closed')
+
+    def __init__(self, stream, event_time, open_time, close_time, open, high, low, close, volume, closed):
+        self.stream = stream
+        self.event_time = event_time
+        self.open_time = open_time
+        self.close_time = close_time
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+        self.closed = closed
+
+
+if msgspec is not None:
+    class _Kline(msgspec.Struct):
+        t: int
+        T: int
+        o: str
+        h: str
+        l: str  # noqa: E741 - Binance's field name
+        c: str
+        v: str
+        x: bool
+
+    class _KlineData(msgspec.Struct):
+        E: int
+        k: _Kline
+
+    class _KlineFrame(msgspec.Struct):
+        stream: str
+        data: _KlineData
+
+
+def available_backends() -> list:
+    backends = []
+    if msgspec is not None:
+        backends.append('msgspec')
+    if orjson is not None:
+        backends.append('orjson')
+    backends.append('json')
+    return backends
+
+
+class FrameDecoder:
+    """Decodes websocket frames with one backend chosen up front."""
+
+    def __init__(self, backend: Optional[str] = None):
+        backend = backend or os.getenv('MESSAGE_DECODER') or available_backends()[0]
+        if backend not in available_backends():
+            raise ValueError(f"Decoder backend {backend!r} is not available, have {available_backends()}")
+        self.backend = backend
+
+        if backend == 'msgspec':
+            self.decode = msgspec.json.Decoder().decode
+            self._kline_decoder = msgspec.json.Decoder(_KlineFrame)
+            self.decode_kline = self._decode_kline_struct
+        else:
+            self.decode = orjson.loads if backend == 'orjson' else json.loads
+            self.decode_kline = self._decode_kline_dict
+
+    def _decode_kline_struct(self, raw) -> Optional[KlineEvent]:
+        """Combined-stream kline frame to a KlineEvent; None for any other frame."""
+        if KLINE_MARKER not in raw:
+            return None
+        frame = self._kline_decoder.decode(raw)
+        k = frame.data.k
+        return KlineEvent(frame.stream, frame.data.E, k.t, k.T, float(k.o), float(k.h),
+                          float(k.l), float(k.c), float(k.v), k.x)
+
+    def _decode_kline_dict(self, raw) -> Optional[KlineEvent]:
+        """Combined-stream kline frame to a KlineEvent; None for any other frame."""
+        if KLINE_MARKER not in raw:
+            return None
+        payload = self.decode(raw)
+        data = payload['data']
+        k = data['k']
+        return KlineEvent(payload['stream'], data['E'], k['t'], k['T'], float(k['o']), float(k['h']),
+                          float(k['l']), float(k['c']), float(k['v']), k['x'])
+
+    def decode_mark_price(self, raw) -> Optional[Tuple[str, float]]:
+        """Combined-stream mark price frame to (symbol, mark price); None for any other frame."""
+        if MARK_PRICE_MARKER not in raw:
+            return None
+        data = self.decode(raw)['data']
+        return data['s'], float(data['p'])
@@ -0,0 +1,98 @@
+"""Per-symbol exchange filters with precomputed quantity and price quantizers."""
+import logging
+import time
+from decimal import Decimal, ROUND_DOWN, ROUND_HALF_UP
+from typing import Dict, Optional
+
+
+class SymbolFilters:
+    """LOT_SIZE / MARKET_LOT_SIZE / PRICE_FILTER / MIN_NOTIONAL rules for one symbol."""
+
+    __slots__ = ('symbol', 'step_size', 'min_qty', 'max_qty', 'tick_size', 'min_notional')
+
+    def __init__(self, symbol: str, step_size: Decimal, min_qty: Decimal, max_qty: Decimal,
+                 tick_size: Decimal, min_notional: Decimal = Decimal('0')):
+        self.symbol = symbol
+        # Normalized so quantize() yields exactly the step's decimal places
+        self.step_size = step_size.normalize()
+        self.min_qty = min_qty
+        self.max_qty = max_qty
+        self.tick_size = tick_size.normalize()
+        self.min_notional = min_notional
+
+    @classmethod
+    def from_exchange_info(cls, info: dict) -> 'SymbolFilters':
+        filters = {f['filterType']: f for f in info['filters']}
+        # Market orders are bounded by MARKET_LOT_SIZE where present, but the step comes from LOT_SIZE
+        lot = filters['LOT_SIZE']
+        market_lot = filters.get('MARKET_LOT_SIZE', lot)
+        notional = filters.get('MIN_NOTIONAL', {})
+        return cls(
+            info['symbol'],
+            Decimal(lot['stepSize']),
+            max(Decimal(lot['minQty']), Decimal(market_lot['minQty'])),
+            min(Decimal(lot['maxQty']), Decimal(market_lot['maxQty'])),
+            Decimal(filters['PRICE_FILTER']['tickSize']),
+            Decimal(notional.get('notional', notional.get('minNotional', '0')))
+        )
+
+    @classmethod
+    def fallback(cls, symbol: str) -> 'SymbolFilters':
+        """Used until exchange info has loaded; matches the old fixed 3-decimal rounding."""
+        return cls(symbol, Decimal('0.001'), Decimal('0'), Decimal('Infinity'), Decimal('0.01'))
+
+    def round_quantity(self, quantity) -> Decimal:
+        """Round down to the step size and cap at the max; below the minimum returns 0."""
+        quantity = Decimal(str(quantity))
+        rounded = (quantity / self.step_size).to_integral_value(ROUND_DOWN) * self.step_size
+        rounded = min(rounded, self.max_qty).quantize(self.step_size, rounding=ROUND_DOWN)
+        return rounded if rounded >= self.min_qty and rounded > 0 else Decimal('0')
+
+    def round_price(self, price) -> Decimal:
+        """Round to the nearest tick."""
+        price = Decimal(str(price))
+        return ((price / self.tick_size).to_integral_value(ROUND_HALF_UP) * self.tick_size).quantize(self.tick_size)
+
+    def meets_min_notional(self, quantity, price) -> bool:
+        return Decimal(str(quantity)) * Decimal(str(price)) >= self.min_notional
+
+    def format_quantity(self, quantity) -> str:
+        return format(self.round_quantity(quantity), 'f')
+
+    def format_price(self, price) -> str:
+        return format(self.round_price(price), 'f')
+
+
+class ExchangeInfoCache:
+    """``futures_exchange_info`` loaded once and refreshed after ``ttl`` seconds."""
+
+    def __init__(self, ttl: float = 6 * 60 * 60):
+        self.ttl = ttl
+        self.loaded_at: Optional[float] = None
+        self._filters: Dict[str, SymbolFilters] = {}
+        self._warned = set()
+
+    @property
+    def stale(self) -> bool:
+        return self.loaded_at is None or time.time() - self.loaded_at > self.ttl
+
+    async def load(self, client) -> None:
+        info = await client.futures_exchange_info()
+        filters = {}
+        for symbol_info in info['symbols']:
+            try:
+                filters[symbol_info['symbol']] = SymbolFilters.from_exchange_info(symbol_info)
+            except (KeyError, ArithmeticError):
+                continue  # Symbols without the usual filters cannot be traded here anyway
+        self._filters = filters
+        self.loaded_at = time.time()
+        logging.info(f"Loaded exchange filters for {len(filters)} symbols")
+
+    def get(self, symbol: str) -> SymbolFilters:
+        filters = self._filters.get(symbol)
+        if filters is None:
+            if symbol not in self._warned:
+                logging.warning(f"No exchange filters for {symbol}, using 3-decimal rounding")
+                self._warned.add(symbol)
+            filters = self._filters[symbol] = SymbolFilters.fallback(symbol)
+        return filters
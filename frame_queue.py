@@ -0,0 +1,108 @@
+"""Bounded queue between the websocket receive loop and the strategy worker.
+
+The receive loop only calls ``put``, which never waits, so the socket keeps
+being read (and pings answered) while the worker is busy with an order. If
+the worker falls behind, a queued update for a still-open bar is replaced by
+the newer update for the same stream instead of queueing both; frames that
+close a bar are never conflated, so every closed candle reaches the
+indicators in order.
+"""
+import asyncio
+import collections
+import time
+from typing import Optional, Tuple
+
+STREAM_PREFIX = '{"stream":"'
+CLOSED_MARKER = '"x":true'
+
+
+def stream_key(frame: str) -> Optional[str]:
+    """Stream name of a combined-stream frame, read without parsing the JSON."""
+    if not frame.startswith(STREAM_PREFIX):
+        return None
+    end = frame.find('"', len(STREAM_PREFIX))
+    return frame[len(STREAM_PREFIX):end] if end > 0 else None
+
+
+class ConflatingFrameQueue:
+    """FIFO of (frame, receive time) with per-stream conflation of open-bar updates.
+
+    Everything runs on the event loop, so no locking is needed. When
+    ``maxsize`` frames are queued the oldest frame that does not close a bar
+    is dropped.
+    """
+
+    def __init__(self, maxsize: int = 10_000):
+        self.maxsize = maxsize
+        self._entries = collections.deque()  # [stream, frame, received_at]
+        self._latest = {}  # stream -> its queued entry that newer updates may overwrite
+        self._ready = asyncio.Event()
+
+        # Accounting
+        self.enqueued = 0
+        self.conflated = 0
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def put(self, frame: str, received_at: Optional[float] = None) -> None:
+        """Queue a frame without waiting."""
+        if received_at is None:
+            received_at = time.perf_counter()
+        stream = stream_key(frame)
+        self.enqueued += 1
+
+        if stream is not None and CLOSED_MARKER not in frame:
+            entry = self._latest.get(stream)
+            if entry is not None:
+                # Still waiting to be processed: only the newest state of the bar matters
+                entry[1] = frame
+                entry[2] = received_at
+                self.conflated += 1
+                return
+
+        if len(self._entries) >= self.maxsize:
+            self._drop_oldest_open()
+
+        entry = [stream, frame, received_at]
+        self._entries.append(entry)
+        if stream is not None:
+            if CLOSED_MARKER in frame:
+                # Later updates must queue behind the close, not overwrite an earlier entry
+                self._latest.pop(stream, None)
+            else:
+                self._latest[stream] = entry
+        self._ready.set()
+
+    def _drop_oldest_open(self) -> None:
+        """Make room by dropping the oldest frame that does not close a bar.
+
+        If only closing frames are queued nothing is dropped and the queue
+        grows past ``maxsize``.
+        """
+        for index, entry in enumerate(self._entries):
+            if CLOSED_MARKER not in entry[1]:
+                del self._entries[index]
+                if self._latest.get(entry[0]) is entry:
+                    del self._latest[entry[0]]
+                self.dropped += 1
+                return
+
+    async def get(self) -> Tuple[str, float]:
+        """Wait for the next frame; returns (frame, receive time from ``time.perf_counter``)."""
+        while not self._entries:
+            self._ready.clear()
+            await self._ready.wait()
+        entry = self._entries.popleft()
+        if self._latest.get(entry[0]) is entry:
+            del self._latest[entry[0]]
+        return entry[1], entry[2]
+
+    def stats(self) -> dict:
+        return {
+            'depth': len(self._entries),
+            'enqueued': self.enqueued,
+            'conflated': self.conflated,
+            'dropped': self.dropped,
+        }
@@ -0,0 +1,179 @@
+"""Streaming indicators updated in O(1) per price."""
+from typing import Dict, Iterable, Optional, Tuple
+
+# Running sums accumulate float error; rebuild them from the buffer this often
+RESYNC_INTERVAL = 10_000
+
+
+class RingBuffer:
+    """Fixed-capacity buffer of floats, oldest values are overwritten."""
+
+    __slots__ = ('capacity', '_data', '_head', '_count')
+
+    def __init__(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError(f"capacity must be positive, got {capacity}")
+        self.capacity = capacity
+        self._data = [0.0] * capacity
+        self._head = 0  # Index the next value is written to
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index: int) -> float:
+        """Index relative to insertion order, -1 is the newest value."""
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("ring buffer index out of range")
+        start = self._head - self._count
+        return self._data[(start + index) % self.capacity]
+
+    def append(self, value: float) -> None:
+        self._data[self._head] = value
+        self._head = (self._head + 1) % self.capacity
+        if self._count < self.capacity:
+            self._count += 1
+
+    def replace_last(self, value: float) -> None:
+        if not self._count:
+            raise IndexError("replace_last on empty ring buffer")
+        self._data[(self._head - 1) % self.capacity] = value
+
+    def clear(self) -> None:
+        self._head = 0
+        self._count = 0
+
+    def to_list(self) -> list:
+        return [self[i] for i in range(self._count)]
+
+
+class EMA:
+    """Exponential moving average, seeded with the first value."""
+
+    __slots__ = ('period', 'alpha', 'value')
+
+    def __init__(self, period: int):
+        self.period = period
+        self.alpha = 2 / (period + 1)
+        self.value: Optional[float] = None
+
+    def update(self, price: float) -> float:
+        if self.value is None:
+            self.value = price
+        else:
+            self.value += self.alpha * (price - self.value)
+        return self.value
+
+    def preview(self, price: float) -> float:
+        """EMA value if ``price`` were the next update, without committing it."""
+        if self.value is None:
+            return price
+        return self.value + self.alpha * (price - self.value)
+
+
+class Crossover:
+    """Tracks the sign of ``fast - slow`` and reports when it flips."""
+
+    __slots__ = ('state',)
+
+    def __init__(self):
+        self.state: Optional[str] = None  # 'long', 'short', or None
+
+    def update(self, fast: float, slow: float) -> Optional[str]:
+        """Return the new state on a crossover, otherwise None."""
+        new_state = 'long' if fast > slow else 'short'
+        crossed = self.state is not None and new_state != self.state
+        self.state = new_state
+        return new_state if crossed else None
+
+
+class MovingAverageEngine:
+    """Short/long simple moving averages over a ring buffer with running sums.
+
+    Means use however many values are available up to the window size, which
+    matches ``rolling(window, min_periods=1).mean()``.
+    """
+
+    def __init__(self, short_window: int, long_window: int, ema_periods: Iterable[int] = ()):
+        if not 0 < short_window <= long_window:
+            raise ValueError(f"need 0 < short_window <= long_window, got {short_window}/{long_window}")
+        self.short_window = short_window
+        self.long_window = long_window
+        self.prices = RingBuffer(long_window)
+        self.emas: Dict[int, EMA] = {period: EMA(period) for period in ema_periods}
+        self.crossover = Crossover()
+        self._short_sum = 0.0
+        self._long_sum = 0.0
+        self._updates = 0
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+    @property
+    def ready(self) -> bool:
+        return len(self.prices) >= self.long_window
+
+    @property
+    def short_ma(self) -> float:
+        return self._short_sum / min(len(self.prices), self.short_window)
+
+    @property
+    def long_ma(self) -> float:
+        return self._long_sum / len(self.prices)
+
+    @property
+    def signal(self) -> Optional[str]:
+        return self.crossover.state
+
+    def update(self, price: float) -> Optional[str]:
+        """Add a price; returns the new signal if the MAs crossed, else None."""
+        prices = self.prices
+        count = len(prices)
+        if count >= self.short_window:
+            self._short_sum -= prices[-self.short_window]
+        if count >= self.long_window:
+            self._long_sum -= prices[-self.long_window]
+        prices.append(price)
+        self._short_sum += price
+        self._long_sum += price
+
+        for ema in self.emas.values():
+            ema.update(price)
+
+        self._updates += 1
+        if self._updates % RESYNC_INTERVAL == 0:
+            self._resync()
+
+        return self.crossover.update(self.short_ma, self.long_ma)
+
+    def preview(self, price: float) -> Tuple[float, float]:
+        """Short and long MA if ``price`` were the next value, without committing it."""
+        prices = self.prices
+        count = len(prices)
+        short_sum = self._short_sum + price
+        long_sum = self._long_sum + price
+        if count >= self.short_window:
+            short_sum -= prices[-self.short_window]
+        if count >= self.long_window:
+            long_sum -= prices[-self.long_window]
+        return (short_sum / min(count + 1, self.short_window),
+                long_sum / min(count + 1, self.long_window))
+
+    def extend(self, values: Iterable[float]) -> None:
+        for price in values:
+            self.update(price)
+
+    def reset(self) -> None:
+        self.prices.clear()
+        self.emas = {period: EMA(period) for period in self.emas}
+        self.crossover = Crossover()
+        self._short_sum = 0.0
+        self._long_sum = 0.0
+        self._updates = 0
+
+    def _resync(self) -> None:
+        values = self.prices.to_list()
+        self._long_sum = sum(values)
+        self._short_sum = sum(values[-self.short_window:])
@@ -0,0 +1,145 @@
+"""Append-only columnar kline store, one directory per symbol and timeframe.
+
+    <root>/<SYMBOL>/<timeframe>/open_time.i8, close_time.i8, open.f8, high.f8, low.f8, close.f8, volume.f8
+
+Each column is a raw little-endian NumPy file with one value per closed
+candle, ordered by open time. A candle is appended only if it is newer than
+the last stored one, so files are never rewritten. Readers get
+``np.memmap`` slices for a time range: no parsing, no copy, and only the
+pages touched are read from disk.
+
+If the process dies between column writes, the columns are trimmed back to
+the shortest one the next time the writer opens the store. Readers such as
+the backtester use ``open_readonly``, which never creates, truncates or
+writes a file, so it is safe next to the running bot: it sees the rows every
+column already holds.
+"""
+import os
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from candles import Candle
+
+COLUMNS = (
+    ('open_time', '<i8'),
+    ('close_time', '<i8'),
+    ('open', '<f8'),
+    ('high', '<f8'),
+    ('low', '<f8'),
+    ('close', '<f8'),
+    ('volume', '<f8'),
+)
+
+
+class KlineStore:
+    """Closed candles of one symbol and timeframe on disk."""
+
+    def __init__(self, directory: str, readonly: bool = False):
+        self.directory = directory
+        self.readonly = readonly
+        if readonly:
+            self.rows = min(self._sizes().values())
+        else:
+            os.makedirs(directory, exist_ok=True)
+            self.rows = self._recover()
+        self._views: Optional[Dict[str, np.ndarray]] = None
+        self.last_open_time: Optional[int] = int(self._map()['open_time'][-1]) if self.rows else None
+
+    @classmethod
+    def for_stream(cls, root: str, symbol: str, timeframe: str) -> 'KlineStore':
+        return cls(os.path.join(root, symbol, timeframe))
+
+    @classmethod
+    def open_readonly(cls, directory: str) -> 'KlineStore':
+        """Open an existing store for reading only, e.g. while the bot is appending to it."""
+        for name, dtype in COLUMNS:
+            path = os.path.join(directory, f"{name}.{dtype[1:]}")
+            if not os.path.isfile(path):
+                raise FileNotFoundError(f"{directory} is not a kline store: {path} is missing")
+        return cls(directory, readonly=True)
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def _path(self, name: str, dtype: str) -> str:
+        return os.path.join(self.directory, f"{name}.{dtype[1:]}")
+
+    def _sizes(self) -> Dict[str, int]:
+        """Values in each column file, 0 for a missing file."""
+        sizes = {}
+        for name, dtype in COLUMNS:
+            path = self._path(name, dtype)
+            sizes[name] = os.path.getsize(path) // np.dtype(dtype).itemsize if os.path.exists(path) else 0
+        return sizes
+
+    def _recover(self) -> int:
+        """Row count all columns agree on, trimming a partially written last row."""
+        sizes = self._sizes()
+        rows = min(sizes.values())
+        for name, dtype in COLUMNS:
+            if sizes[name] != rows or not os.path.exists(self._path(name, dtype)):
+                with open(self._path(name, dtype), 'ab') as f:
+                    f.truncate(rows * np.dtype(dtype).itemsize)
+        return rows
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+    def append(self, candles: Iterable[Candle]) -> int:
+        """Append the candles newer than the last stored one, oldest first; returns how many were added."""
+        if self.readonly:
+            raise ValueError(f"Kline store {self.directory} is open read-only")
+        new = []
+        last = self.last_open_time
+        for candle in candles:
+            if last is None or candle.open_time > last:
+                new.append(candle)
+                last = candle.open_time
+        if not new:
+            return 0
+        for name, dtype in COLUMNS:
+            values = np.fromiter((getattr(candle, name) for candle in new), dtype=dtype, count=len(new))
+            with open(self._path(name, dtype), 'ab') as f:
+                f.write(values.tobytes())
+        self.rows += len(new)
+        self.last_open_time = last
+        return len(new)
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+    def _map(self) -> Dict[str, np.ndarray]:
+        """Memory-mapped columns covering every stored row, remapped after appends."""
+        if self._views is None or len(self._views['open_time']) != self.rows:
+            if not self.rows:
+                return {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS}
+            self._views = {name: np.memmap(self._path(name, dtype), dtype=dtype, mode='r', shape=(self.rows,))
+                           for name, dtype in COLUMNS}
+        return self._views
+
+    def read(self, start: Optional[int] = None, end: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Column views of the candles with ``start <= open_time < end`` (ms); no data is copied."""
+        columns = self._map()
+        open_time = columns['open_time']
+        low = int(np.searchsorted(open_time, start, side='left')) if start is not None else 0
+        high = int(np.searchsorted(open_time, end, side='left')) if end is not None else len(open_time)
+        return {name: column[low:high] for name, column in columns.items()}
+
+    def tail(self, count: int) -> Dict[str, np.ndarray]:
+        """Column views of the last ``count`` candles."""
+        return {name: column[max(self.rows - count, 0):] for name, column in self._map().items()}
+
+    def candles(self, start: Optional[int] = None, count: Optional[int] = None) -> List[Candle]:
+        """Stored candles as Candle objects: from ``start`` on, or the last ``count``."""
+        columns = self.read(start) if start is not None else self.tail(count or self.rows)
+        return [Candle(*row, closed=True) for row in zip(
+            columns['open_time'].tolist(), columns['close_time'].tolist(), columns['open'].tolist(),
+            columns['high'].tolist(), columns['low'].tolist(), columns['close'].tolist(),
+            columns['volume'].tolist())]
+
+    def gaps(self, interval_ms: int) -> List[tuple]:
+        """(first missing open time, next stored open time) for every hole in the series."""
+        open_time = self._map()['open_time']
+        holes = np.flatnonzero(np.diff(open_time) > interval_ms)
+        return [(int(open_time[i]) + interval_ms, int(open_time[i + 1])) for i in holes]
@@ -0,0 +1,74 @@
+"""Queue-based logging: callers only enqueue records, a background thread formats and writes them.
+
+Records are handed to the writer thread unformatted, so ``logging.info("x=%s", x)``
+costs the caller a level check and a queue put. Messages are formatted by
+the writer; don't mutate objects passed as log arguments after logging them.
+"""
+import json
+import logging
+import logging.handlers
+import queue
+from datetime import datetime, timezone
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Attributes every LogRecord has; anything else came in through ``extra=``
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread."""
+
+    def prepare(self, record):
+        # The stock handler formats here, on the caller's thread; the record
+        # never leaves the process, so it can go on the queue as it is.
+        return record
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """One compact JSON object per line, including any ``extra=`` fields."""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'msg': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, separators=(',', ':'), default=str, ensure_ascii=False)
+
+
+def setup_logging(path='trading_bot.log', level=logging.INFO, json_lines=False, rotate_when=None,
+                  max_bytes=10 * 1024 * 1024, backup_count=5) -> logging.handlers.QueueListener:
+    """Route the root logger through a queue to a rotating file and the console.
+
+    The file rotates at ``max_bytes``, or on a schedule when ``rotate_when`` is
+    set (``'midnight'``, ``'H'``, ... as for TimedRotatingFileHandler).
+    ``json_lines`` switches the file to JSON lines; the console stays text.
+    Returns the started listener; stop it on shutdown to flush.
+    """
+    if rotate_when:
+        file_handler = logging.handlers.TimedRotatingFileHandler(path, when=rotate_when,
+                                                                 backupCount=backup_count, encoding='utf-8')
+    else:
+        file_handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes,
+                                                            backupCount=backup_count, encoding='utf-8')
+    file_handler.setFormatter(JsonLinesFormatter() if json_lines else logging.Formatter(TEXT_FORMAT))
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(DeferredQueueHandler(log_queue))
+    root.setLevel(level)
+
+    listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler,
+                                              respect_handler_level=True)
+    listener.start()
+    return listener
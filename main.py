@@ -1,77 +1,230 @@
-import websocket
-import json
-import pandas as pd
-import numpy as np
-from binance.client import Client
-from binance.exceptions import APIError
-from binance.enums import SIDE_BUY, SIDE_SELL, ORDER_TYPE_MARKET, FUTURE_ORDER_TYPE_STOP_MARKET
+import aiohttp
 import time
 from datetime import datetime
 import os
 import logging
-import requests
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes
 import asyncio
-from typing import Optional
-import threading
-from flask import Flask
-from decimal import Decimal, ROUND_DOWN
-
-# Initialize Flask app
-flask_app = Flask(__name__)
-
-@flask_app.route('/')
-def home():
-    return "Bot is running!"
-
-@flask_app.route('/health')
-def health_check():
-    return "OK", 200
-
-def run_flask():
-    flask_app.run(host='0.0.0.0', port=int(os.environ.get("PORT", 5000)))
-
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('trading_bot.log'),
-        logging.StreamHandler()
-    ]
+import importlib
+import random
+import uuid
+from typing import TYPE_CHECKING, Dict, Optional
+from decimal import Decimal
+from candles import Candle, interval_to_milliseconds
+from strategy import StrategyRegistry
+from account_state import AccountState
+from notifier import TelegramNotifier
+from exchange_info import ExchangeInfoCache
+from metrics import REGISTRY, LAG_BUCKETS
+from logging_config import setup_logging
+from rest_client import RateLimitedClient
+from decoding import FrameDecoder
+from recorder import FrameRecorder
+from state_store import StateStore
+from frame_queue import ConflatingFrameQueue
+from status import StatusSnapshot
+from stream_supervisor import Backoff, StreamSupervisor
+from order_book import OrderBookCache
+from kline_store import KlineStore
+
+if TYPE_CHECKING:
+    from telegram import Update
+    from telegram.ext import Application, ContextTypes
+
+# python-binance, python-telegram-bot and aiohttp.web take most of the startup time to
+# import, so each is imported when its subsystem starts (see benchmarks/bench_startup.py).
+# Order sides and types, with the same values as binance.enums
+SIDE_BUY = 'BUY'
+SIDE_SELL = 'SELL'
+ORDER_TYPE_MARKET = 'MARKET'
+FUTURE_ORDER_TYPE_STOP_MARKET = 'STOP_MARKET'
+
+async def import_off_loop(name):
+    """Import a module in a worker thread, so the event loop keeps serving the streams meanwhile"""
+    return await asyncio.to_thread(importlib.import_module, name)
+
+async def build_web_app():
+    """Health and metrics endpoints"""
+    web = await import_off_loop('aiohttp.web')
+    
+    async def home(request):
+        return web.Response(text="Bot is running!")
+    
+    async def health_check(request):
+        return web.Response(text="OK")
+    
+    async def metrics_endpoint(request):
+        # Prometheus text exposition format
+        return web.Response(body=REGISTRY.render().encode(),
+                            headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'})
+    
+    web_app = web.Application()
+    web_app.add_routes([web.get('/', home), web.get('/health', health_check), web.get('/metrics', metrics_endpoint)])
+    return web_app
+
+async def run_web_server():
+    """Serve the web app from the bot's event loop"""
+    web_app = await build_web_app()
+    from aiohttp import web  # Already loaded by build_web_app()
+    runner = web.AppRunner(web_app)
+    await runner.setup()
+    try:
+        site = web.TCPSite(runner, '0.0.0.0', int(os.environ.get("PORT", 5000)))
+        await site.start()
+        await asyncio.Event().wait()  # Serve until cancelled
+    finally:
+        await runner.cleanup()
+
+# Setup logging; records are written by a background thread so the event loop never blocks on disk.
+# LOG_LEVEL=DEBUG adds per-signal MA lines, LOG_FORMAT=json writes the file as JSON lines,
+# LOG_ROTATE_WHEN (e.g. 'midnight') rotates on a schedule instead of at LOG_MAX_BYTES.
+log_listener = setup_logging(
+    path=os.getenv('LOG_FILE', 'trading_bot.log'),
+    level=os.getenv('LOG_LEVEL', 'INFO').upper(),
+    json_lines=os.getenv('LOG_FORMAT', 'text') == 'json',
+    rotate_when=os.getenv('LOG_ROTATE_WHEN'),
+    max_bytes=int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024)),
+    backup_count=int(os.getenv('LOG_BACKUP_COUNT', 5))
 )
 
-# Initialize Binance client
+# Binance credentials; the async client is created on the first REST call and
+# wrapped so every REST call is weighed against Binance's rate limits
 api_key = os.getenv('api_key')
 api_secret = os.getenv('api_secret')
-client = Client(api_key, api_secret)
-client.FUTURES_URL = 'https://fapi.binance.com'
+client: Optional[RateLimitedClient] = None
+
+async def create_binance_client():
+    """Build the futures REST client; no ping, the first real request shows whether it works"""
+    binance = await import_off_loop('binance')
+    binance_client = binance.AsyncClient(api_key, api_secret)
+    binance_client.FUTURES_URL = 'https://fapi.binance.com'
+    return binance_client
+
+# Shared HTTP session for the websocket connections, also created in main()
+http_session: Optional[aiohttp.ClientSession] = None
 
-# Trading parameters
-symbol = 'LTCUSDT'
-timeframe = '5m'
+# Trading pairs, one entry per symbol with the timeframe it trades on. Any setting left
+# out of an entry falls back to the defaults below. Positions are per symbol in one-way
+# mode, so a symbol can only be listed once.
+TRADING_PAIRS = [
+    {'symbol': 'LTCUSDT', 'timeframe': '5m'},
+]
+
+# Default trading parameters
 short_window = 7
 long_window = 30
 leverage = 10
-ACCOUNT_USAGE_PERCENTAGE = 95  # Use 95% of account balance
+ACCOUNT_USAGE_PERCENTAGE = 95  # Use 95% of account balance, split evenly between pairs without their own setting
 STOP_LOSS_PERCENTAGE = 2  # 2% stop loss
+INTRABAR_SIGNALS = False  # Also evaluate the strategy on pushes for the still-open candle
+MAX_SLIPPAGE_BPS = 10  # Cap new exposure to what the order book fills within this of the best price; 0 disables
 
-# Store price data and position state
-prices = []
-last_signal = None  # 'long', 'short', or None
+# Per-pair price data and signal state, keyed by kline stream name
+strategies = StrategyRegistry.from_config(
+    TRADING_PAIRS,
+    short_window=short_window,
+    long_window=long_window,
+    leverage=leverage,
+    stop_loss_percentage=STOP_LOSS_PERCENTAGE,
+    account_usage_percentage=ACCOUNT_USAGE_PERCENTAGE
+)
 last_websocket_message = time.time()
 WEBSOCKET_TIMEOUT = 60  # seconds
+WEBSOCKET_MAX_AGE = 23 * 60 * 60  # seconds, rotate before Binance cuts connections at 24 hours
+
+# Market data websocket with reconnects and rotation; created in run_trading_bot()
+market_stream: Optional[StreamSupervisor] = None
+
+# Symbols whose leverage and margin type are already set; setup runs once per symbol
+leverage_configured = set()
+
+# Frames go from the receive loop to the strategy worker through this queue
+frame_queue = ConflatingFrameQueue()
+
+# Websocket JSON decoding, with orjson/msgspec when installed
+decoder = FrameDecoder()
+
+# Local order books from the depth diff stream, used to cap orders to the available liquidity
+order_books = OrderBookCache(strategies.symbols, decoder.decode)
+
+# Candle history, last signals and stop orders survive restarts here; opened in main()
+STATE_DB = os.getenv('STATE_DB', 'bot_state.db')
+state_store: Optional[StateStore] = None
+
+# Closed candles per pair on disk, for warm-ups and backtests; opened in main()
+KLINE_DIR = os.getenv('KLINE_DIR', 'klines')
+KLINE_HISTORY = int(os.getenv('KLINE_HISTORY', 1500))  # candles downloaded into an empty store
+KLINES_PER_REQUEST = 1500  # futures_klines maximum
+kline_stores: Dict[str, KlineStore] = {}
+kline_syncs: Dict[str, asyncio.Task] = {}
+
+# Set RECORD_DIR to capture every websocket frame for replay.py
+RECORD_DIR = os.getenv('RECORD_DIR')
+recorder = FrameRecorder(RECORD_DIR) if RECORD_DIR else None
+
+# Account state cache, seeded over REST and kept current from the user-data stream
+account_state = AccountState()
+LISTEN_KEY_KEEPALIVE_INTERVAL = 30 * 60  # seconds, Binance expires listen keys after 60 minutes
+ACCOUNT_RECONCILE_INTERVAL = 5 * 60  # seconds between REST reconciliations
+STATUS_MAX_AGE = 60  # seconds a REST seed is trusted for /status while the user-data stream is down
+
+# LOT_SIZE / PRICE_FILTER / MIN_NOTIONAL per symbol, loaded once and refreshed every few hours
+exchange_filters = ExchangeInfoCache()
 
 # Telegram configuration
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
 
+# Outgoing notifications are queued and sent by a background worker
+notifier = TelegramNotifier(TELEGRAM_TOKEN, TELEGRAM_CHAT_ID)
+
 # Store the application globally
-telegram_app: Optional[Application] = None
+telegram_app: Optional['Application'] = None
+
+# Latency histograms and counters, exported at /metrics
+SPAN_SECONDS = REGISTRY.histogram('bot_span_seconds', "Time spent in hot-path steps", ('span',))
+DECODE_SPAN = SPAN_SECONDS.labels('decode')
+QUEUE_WAIT_SPAN = SPAN_SECONDS.labels('queue_wait')
+INDICATOR_SPAN = SPAN_SECONDS.labels('indicator_update')
+GET_POSITION_SPAN = SPAN_SECONDS.labels('get_position')
+POSITION_SIZE_SPAN = SPAN_SECONDS.labels('calculate_position_size')
+SIGNAL_TO_FILL_SECONDS = REGISTRY.histogram('bot_signal_to_fill_seconds',
+                                            "Websocket frame receipt to market order acknowledgement")
+EVENT_LAG_SECONDS = REGISTRY.histogram('bot_exchange_event_lag_seconds',
+                                       "Local receive time minus exchange event time", ('source',), LAG_BUCKETS)
+MARKET_EVENT_LAG = EVENT_LAG_SECONDS.labels('market')
+USER_EVENT_LAG = EVENT_LAG_SECONDS.labels('user_data')
+WEBSOCKET_MESSAGES = REGISTRY.counter('bot_websocket_messages_total', "Kline messages received", ('stream',))
+REGISTRY.gauge('bot_websocket_last_message_age_seconds', "Seconds since the last market data message",
+               function=lambda: time.time() - last_websocket_message)
+REGISTRY.gauge('bot_frame_queue_depth', "Market data frames waiting for the strategy worker",
+               function=lambda: len(frame_queue))
+REGISTRY.counter('bot_frame_queue_conflated_total', "Open-bar updates replaced by a newer one while queued",
+                 function=lambda: frame_queue.conflated)
+REGISTRY.counter('bot_frame_queue_dropped_total', "Open-bar frames dropped because the queue was full",
+                 function=lambda: frame_queue.dropped)
+REGISTRY.counter('bot_status_cache_hits_total', "Status requests served from the rendered snapshot",
+                 function=lambda: status_snapshot.hits)
+REGISTRY.counter('bot_status_refreshes_total', "REST refreshes started because the account state was stale",
+                 function=lambda: status_snapshot.refreshes)
+REGISTRY.counter('bot_websocket_connects_total', "Market data websocket connections opened",
+                 function=lambda: market_stream.connects if market_stream else 0)
+REGISTRY.counter('bot_websocket_rotations_total', "Market data connections replaced ahead of the 24h limit",
+                 function=lambda: market_stream.rotations if market_stream else 0)
+REGISTRY.counter('bot_websocket_duplicate_frames_total', "Frames dropped because an overlapping connection delivered them",
+                 function=lambda: market_stream.dedup.duplicates if market_stream else 0)
+REGISTRY.counter('bot_order_book_gaps_total', "Depth diff sequence gaps that forced a new snapshot",
+                 function=lambda: order_books.gaps)
+ORDERS_CAPPED = REGISTRY.counter('bot_orders_capped_total', "Orders reduced to fit the order book's liquidity")
+REGISTRY.gauge('bot_telegram_queue_depth', "Notifications waiting to be sent",
+               function=lambda: notifier.stats()['queued'])
+REGISTRY.counter('bot_telegram_dropped_total', "Notifications dropped because the queue was full",
+                 function=lambda: notifier.dropped)
+REGISTRY.counter('bot_telegram_failed_total', "Notifications that could not be delivered",
+                 function=lambda: notifier.failed)
 
-async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+async def start(update: 'Update', context: 'ContextTypes.DEFAULT_TYPE') -> None:
     """Send a message when the command /start is issued."""
+    from telegram import InlineKeyboardButton, InlineKeyboardMarkup
     if update.message is None:
         return
         
@@ -81,8 +234,47 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     reply_markup = InlineKeyboardMarkup(keyboard)
     await update.message.reply_text('Welcome to the Trading Bot! Use the button below to check your position:', reply_markup=reply_markup)
 
-async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+def format_account_status() -> str:
+    """Build the account status message for every traded symbol"""
+    message = f"💰 <b>Account Status</b>\n\n"
+    message += f"Balance: {account_state.balance('USDT'):.2f} USDT\n"
+    
+    for symbol in strategies.symbols:
+        # Get current position
+        position_data = account_state.position(symbol)
+        position = position_data.amount if position_data else Decimal('0')
+        
+        # Get current price
+        current_price = account_state.price(symbol)
+        mark_price = account_state.mark_price(symbol)
+        
+        # Calculate unrealized PNL
+        unrealized_pnl = account_state.unrealized_pnl(symbol)
+        
+        message += f"\n<b>{symbol}</b>\n"
+        message += f"Current Position: {abs(position):.3f} {symbol}\n"
+        message += f"Position Type: {'Long' if position > 0 else 'Short' if position < 0 else 'None'}\n"
+        message += f"Entry Price: {position_data.entry_price if position_data else 'N/A'}\n"
+        message += f"Current Price: {current_price}\n"
+        message += f"Mark Price: {mark_price}\n"
+        message += f"Unrealized PNL: {unrealized_pnl:.2f} USDT\n"
+        message += f"Leverage: {strategies.for_symbol(symbol)[0].leverage}x\n"
+    
+    if not account_state.live and account_state.seeded_at is not None:
+        message += f"\n⚠️ Account data as of {datetime.fromtimestamp(account_state.seeded_at).strftime('%H:%M:%S')}"
+    message += f"\nTime: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+    return message
+
+# Rendered once per couple of seconds however often Refresh is pressed; REST only when the cache is stale
+status_snapshot = StatusSnapshot(
+    format_account_status,
+    lambda: account_state.is_fresh(STATUS_MAX_AGE),
+    lambda: refresh_account_state()
+)
+
+async def button_callback(update: 'Update', context: 'ContextTypes.DEFAULT_TYPE') -> None:
     """Handle button presses."""
+    from telegram import InlineKeyboardButton, InlineKeyboardMarkup
     if update.callback_query is None:
         return
         
@@ -91,32 +283,7 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     
     if query.data == 'check_position':
         try:
-            # Get account balance
-            account = client.futures_account_balance()
-            usdt_balance = next((float(balance['balance']) for balance in account if balance['asset'] == 'USDT'), 0)
-            
-            # Get current position
-            position = get_position()
-            position_info = client.futures_position_information(symbol=symbol)
-            position_data = position_info[0] if position_info else None
-            
-            # Get current price
-            ticker = client.futures_symbol_ticker(symbol=symbol)
-            current_price = float(ticker['price'])
-            
-            # Calculate unrealized PNL
-            unrealized_pnl = float(position_data['unRealizedProfit']) if position_data else 0
-            
-            # Format message
-            message = f"💰 <b>Account Status</b>\n\n"
-            message += f"Balance: {usdt_balance:.2f} USDT\n"
-            message += f"Current Position: {abs(position):.3f} {symbol}\n"
-            message += f"Position Type: {'Long' if position > 0 else 'Short' if position < 0 else 'None'}\n"
-            message += f"Entry Price: {position_data['entryPrice'] if position_data else 'N/A'}\n"
-            message += f"Current Price: {current_price}\n"
-            message += f"Unrealized PNL: {unrealized_pnl:.2f} USDT\n"
-            message += f"Leverage: {leverage}x\n"
-            message += f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+            message = await status_snapshot.get()
             
             # Add refresh button
             keyboard = [[InlineKeyboardButton("Refresh", callback_data='check_position')]]
@@ -128,46 +295,24 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             error_message = f"❌ <b>Error Getting Position</b>\n{str(e)}"
             await query.edit_message_text(text=error_message, parse_mode='HTML')
 
-async def check_position_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def check_position_command(update: 'Update', context: 'ContextTypes.DEFAULT_TYPE'):
     """Handle the /status command"""
     if update.message is None:
         return
         
     try:
+        message = await status_snapshot.get()
+        
         # Get account balance
-        account = client.futures_account_balance()
-        if not account:
+        if account_state.seeded_at is None:
             await update.message.reply_text("❌ Failed to get account balance")
             return
             
-        usdt_balance = next((float(balance['balance']) for balance in account if balance['asset'] == 'USDT'), 0)
+        usdt_balance = account_state.balance('USDT')
         if usdt_balance <= 0:
             await update.message.reply_text("❌ Invalid USDT balance")
             return
         
-        # Get current position
-        position = get_position()
-        position_info = client.futures_position_information(symbol=symbol)
-        position_data = position_info[0] if position_info else None
-        
-        # Get current price
-        ticker = client.futures_symbol_ticker(symbol=symbol)
-        current_price = float(ticker['price'])
-        
-        # Calculate unrealized PNL
-        unrealized_pnl = float(position_data['unRealizedProfit']) if position_data else 0
-        
-        # Format message
-        message = f"💰 <b>Account Status</b>\n\n"
-        message += f"Balance: {usdt_balance:.2f} USDT\n"
-        message += f"Current Position: {abs(position):.3f} {symbol}\n"
-        message += f"Position Type: {'Long' if position > 0 else 'Short' if position < 0 else 'None'}\n"
-        message += f"Entry Price: {position_data['entryPrice'] if position_data else 'N/A'}\n"
-        message += f"Current Price: {current_price}\n"
-        message += f"Unrealized PNL: {unrealized_pnl:.2f} USDT\n"
-        message += f"Leverage: {leverage}x\n"
-        message += f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-        
         await update.message.reply_text(message, parse_mode='HTML')
         
     except Exception as e:
@@ -175,63 +320,67 @@ async def check_position_command(update: Update, context: ContextTypes.DEFAULT_T
         await update.message.reply_text(error_message, parse_mode='HTML')
 
 def send_telegram_message(message: str) -> None:
-    """Send a message to Telegram"""
-    try:
-        url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
-        data = {
-            "chat_id": TELEGRAM_CHAT_ID,
-            "text": message,
-            "parse_mode": "HTML"
-        }
-        response = requests.post(url, data=data)
-        if response.status_code != 200:
-            logging.error(f"Failed to send Telegram message: {response.text}")
-    except Exception as e:
-        logging.error(f"Error sending Telegram message: {e}")
+    """Queue a message for Telegram; never blocks on the network"""
+    notifier.send(message)
 
-def setup_leverage():
-    try:
-        # Set leverage
-        client.futures_change_leverage(symbol=symbol, leverage=leverage)
-        logging.info(f"Leverage set to {leverage}x")
-        
-        # Set margin type to isolated
-        client.futures_change_margin_type(symbol=symbol, marginType='ISOLATED')
-        logging.info("Margin type set to ISOLATED")
-    except Exception as e:
-        logging.error(f"Error setting up leverage: {e}")
+async def setup_leverage():
+    """Set leverage and isolated margin for symbols not configured yet"""
+    from binance.exceptions import BinanceAPIException
+    for symbol in strategies.symbols:
+        if symbol in leverage_configured:
+            continue
+        symbol_leverage = strategies.for_symbol(symbol)[0].leverage
+        try:
+            # Set leverage
+            await client.futures_change_leverage(symbol=symbol, leverage=symbol_leverage)
+            logging.info(f"{symbol} leverage set to {symbol_leverage}x")
+            
+            # Set margin type to isolated
+            try:
+                await client.futures_change_margin_type(symbol=symbol, marginType='ISOLATED')
+                logging.info(f"{symbol} margin type set to ISOLATED")
+            except BinanceAPIException as e:
+                if e.code != -4046:  # No need to change margin type
+                    raise
+            leverage_configured.add(symbol)
+        except Exception as e:
+            logging.error(f"Error setting up leverage for {symbol}: {e}")
 
-def calculate_position_size():
+def calculate_position_size(strategy):
+    with POSITION_SIZE_SPAN.time():
+        return _calculate_position_size(strategy)
+
+def _calculate_position_size(strategy):
     try:
         # Get account balance
-        account = client.futures_account_balance()
-        if not account:
+        if account_state.seeded_at is None:
             logging.error("Failed to get account balance")
             return 0
             
-        usdt_balance = next((float(balance['balance']) for balance in account if balance['asset'] == 'USDT'), 0)
+        usdt_balance = account_state.balance('USDT')
         if usdt_balance <= 0:
             logging.error(f"Invalid USDT balance: {usdt_balance}")
             return 0
         
         # Get current price
-        ticker = client.futures_symbol_ticker(symbol=symbol)
-        if not ticker or 'price' not in ticker:
+        current_price = account_state.price(strategy.symbol)
+        if current_price is None:
             logging.error("Failed to get current price")
             return 0
             
-        current_price = float(ticker['price'])
         if current_price <= 0:
             logging.error(f"Invalid current price: {current_price}")
             return 0
         
-        # Calculate position size (using 95% of balance with leverage)
-        position_size = (usdt_balance * (ACCOUNT_USAGE_PERCENTAGE / 100) * leverage) / current_price
+        # Calculate position size (using the pair's share of balance with leverage)
+        position_size = (usdt_balance * (strategy.account_usage_percentage / 100) * strategy.leverage) / current_price
         
         # Log the calculation details
-        logging.info(f"Position size calculation: Balance={usdt_balance}, Price={current_price}, Size={position_size}")
+        logging.info("%s position size calculation: Balance=%s, Price=%s, Size=%s",
+                     strategy.symbol, usdt_balance, current_price, position_size)
         
-        return round(position_size, 3)  # Round to 3 decimal places
+        # Round down to the symbol's step size; 0 if below the minimum quantity
+        return exchange_filters.get(strategy.symbol).round_quantity(position_size)
     except Exception as e:
         logging.error(f"Error calculating position size: {str(e)}")
         logging.error(f"Error type: {type(e).__name__}")
@@ -239,23 +388,27 @@ def calculate_position_size():
             logging.error(f"Error details: {e.__dict__}")
         return 0
 
-def place_stop_loss(entry_price, side):
+async def place_stop_loss(strategy, entry_price, side, quantity=None):
+    symbol = strategy.symbol
     try:
-        # If entry_price is None or 0, fetch current price
+        # If entry_price is None or 0, use the latest cached price
         if not entry_price:
-            ticker = client.futures_symbol_ticker(symbol=symbol)
-            entry_price = float(ticker['price'])
+            entry_price = account_state.price(symbol)
             
-        stop_price = entry_price * (1 - STOP_LOSS_PERCENTAGE/100) if side == SIDE_BUY else entry_price * (1 + STOP_LOSS_PERCENTAGE/100)
-        position = get_position()
+        filters = exchange_filters.get(symbol)
+        stop_loss = strategy.stop_loss_percentage / 100
+        stop_price = entry_price * (1 - stop_loss) if side == SIDE_BUY else entry_price * (1 + stop_loss)
+        stop_price = filters.round_price(stop_price)
+        # Protect the quantity just filled, or whatever position we hold
+        position = quantity if quantity is not None else get_position(symbol)
         
         if position != 0:
-            order = client.futures_create_order(
+            order = await client.futures_create_order(
                 symbol=symbol,
                 side=SIDE_SELL if side == SIDE_BUY else SIDE_BUY,
                 type=FUTURE_ORDER_TYPE_STOP_MARKET,
-                stopPrice=stop_price,
-                quantity=abs(position),
+                stopPrice=format(stop_price, 'f'),
+                quantity=filters.format_quantity(abs(position)),
                 reduceOnly=True
             )
             message = f"⚠️ <b>Stop Loss Placed</b>\n"
@@ -265,7 +418,12 @@ def place_stop_loss(entry_price, side):
             message += f"Quantity: {abs(position)}\n"
             message += f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
             send_telegram_message(message)
-            logging.info(f"Stop loss placed at {stop_price}: {order}")
+            # Known to the next reversal even if the user-data stream is behind or down
+            account_state.add_open_order(order)
+            if state_store is not None:
+                state_store.record_stop(symbol, int(order['orderId']))
+            logging.info("Stop loss placed at %s: %s", stop_price, order,
+                         extra={'event': 'stop_loss', 'symbol': symbol, 'stop_price': stop_price, 'quantity': abs(position)})
     except Exception as e:
         error_message = f"❌ <b>Stop Loss Error</b>\n"
         error_message += f"Symbol: {symbol}\n"
@@ -273,162 +431,503 @@ def place_stop_loss(entry_price, side):
         send_telegram_message(error_message)
         logging.error(f"Error placing stop loss: {e}")
 
-def on_message(ws, message):
-    global prices, last_signal, last_websocket_message
-    
+async def on_message(message, received_at=None):
+    """Handle one market data frame; ``received_at`` is its ``time.perf_counter()`` receive time"""
     try:
-        last_websocket_message = time.time()
+        started = time.perf_counter()
+        if received_at is None:
+            received_at = started
+        else:
+            QUEUE_WAIT_SPAN.observe(started - received_at)
         
-        # Parse the websocket message
-        data = json.loads(message)
-        if 'k' not in data:  # Skip non-kline messages
+        # Parse the combined-stream message and route it by stream name
+        kline = decoder.decode_kline(message)
+        DECODE_SPAN.observe(time.perf_counter() - started)
+        if kline is None:
+            mark = decoder.decode_mark_price(message)
+            if mark is not None:
+                account_state.set_mark_price(*mark)
+            return  # Skip subscription replies and other non-kline messages
+        strategy = strategies.get(kline.stream)
+        if strategy is None:  # Skip unknown streams
             return
-            
-        price = Decimal(data['k']['c'])  # Closing price as Decimal
         
-        # Add price to our list
-        prices.append(float(price))  # Keep prices as float for pandas operations
+        WEBSOCKET_MESSAGES.labels(strategy.stream).inc()
+        # Exchange event to local receipt; the time the frame then spent queued is QUEUE_WAIT_SPAN
+        received_wall = time.time() - (time.perf_counter() - received_at)
+        MARKET_EVENT_LAG.observe(received_wall - kline.event_time / 1000)
         
-        # Keep only the last long_window prices
-        if len(prices) > long_window:
-            prices = prices[-long_window:]
+        # Keep the cached price current for sizing and status
+        account_state.set_price(strategy.symbol, kline.close)
         
-        # Only proceed if we have enough data points
-        if len(prices) >= long_window:
-            df = pd.Series(prices)
-            short_ma = df.rolling(window=short_window, min_periods=1).mean().iloc[-1]
-            long_ma = df.rolling(window=long_window, min_periods=1).mean().iloc[-1]
-            
-            # Calculate price movement for logging only
-            price_movement = abs((short_ma - long_ma) / long_ma * 100)
-            
-            # Debug logging for MA calculations
-            logging.info(f"📊 MA Debug - Short MA: {short_ma:.2f}, Long MA: {long_ma:.2f}, Movement: {price_movement:.2f}%")
-            
-            # Get current position
-            position = get_position()
-            
-            # Calculate new position size
-            quantity = Decimal(str(calculate_position_size())).quantize(Decimal('0.001'), rounding=ROUND_DOWN)
-            
-            # Determine current signal
-            current_signal = 'long' if short_ma > long_ma else 'short'
-            
-            # If no position, open one based on current signal
-            if position == Decimal('0'):
-                if current_signal == 'long':
-                    place_order(SIDE_BUY, float(quantity))  # Convert to float for API call
-                    place_stop_loss(float(price), SIDE_BUY)
-                elif current_signal == 'short':
-                    place_order(SIDE_SELL, float(quantity))  # Convert to float for API call
-                    place_stop_loss(float(price), SIDE_SELL)
-                last_signal = current_signal
-                logging.info(f"Opened new {current_signal} position")
-            
-            # Only change position on crossover (when signal changes)
-            elif current_signal != last_signal:
-                if current_signal == 'long':          # BUY signal
-                    if position < Decimal('0'):  # If we have a short position
-                        place_order(SIDE_BUY, float(abs(position)))    #close original order
-                        place_order(SIDE_BUY, float(quantity))
-                        place_stop_loss(float(price), SIDE_BUY)
-                elif current_signal == 'short':        # Sell signal
-                    if position > Decimal('0'):  # If we have a long position
-                        place_order(SIDE_SELL, float(abs(position)))   #close original order
-                        place_order(SIDE_SELL, float(quantity))
-                        place_stop_loss(float(price), SIDE_SELL)
-                
-                # Update last signal
-                last_signal = current_signal
-                logging.info(f"Signal changed to: {current_signal}")
-        else:
-            logging.info(f"Waiting for more data points ({len(prices)}/{long_window})")
+        # Update the open candle in place; only closed candles reach the indicators
+        indicators = strategy.indicators
+        closed_candles = strategy.candles.update(kline)
+        if closed_candles:
+            update_started = time.perf_counter()
+            for candle in closed_candles:
+                indicators.update(candle.close)
+            INDICATOR_SPAN.observe(time.perf_counter() - update_started)
+            if state_store is not None:
+                for candle in closed_candles:
+                    state_store.record_candle(strategy, candle)
+            store_candles(strategy, closed_candles)
+        
+        if closed_candles:
+            if not indicators.ready:
+                logging.info("%s: waiting for more data points (%d/%d)", strategy.stream, len(indicators), strategy.long_window)
+                return
+            await run_strategy(strategy, indicators.short_ma, indicators.long_ma, closed_candles[-1].close, received_at)
+        elif INTRABAR_SIGNALS and strategy.candles.current is not None and indicators.ready:
+            # Treat the open candle as if it closed at the current price
+            current = strategy.candles.current
+            short_ma, long_ma = indicators.preview(current.close)
+            await run_strategy(strategy, short_ma, long_ma, current.close, received_at)
                 
     except Exception as e:
         logging.error(f"Error in message handling: {e}")
 
-def on_error(ws, error):
-    print(f"Error: {error}")
+async def run_strategy(strategy, short_ma, long_ma, price, received_at=None):
+    """Act on a pair's moving-average signal at the given price"""
+    symbol = strategy.symbol
+    
+    # Debug logging for MA calculations; skipped entirely unless debug is on
+    if logging.root.isEnabledFor(logging.DEBUG):
+        price_movement = abs((short_ma - long_ma) / long_ma * 100)
+        logging.debug("📊 MA Debug %s - Short MA: %.2f, Long MA: %.2f, Movement: %.2f%%",
+                      strategy.stream, short_ma, long_ma, price_movement,
+                      extra={'event': 'tick', 'stream': strategy.stream, 'price': price,
+                             'short_ma': short_ma, 'long_ma': long_ma})
+    
+    # Get current position
+    position = get_position(symbol)
+    
+    # Calculate new position size
+    quantity = calculate_position_size(strategy)
+    
+    # Determine current signal
+    current_signal = 'long' if short_ma > long_ma else 'short'
+    
+    # If no position, open one based on current signal
+    if position == Decimal('0'):
+        if current_signal == 'long':
+            await open_position(strategy, SIDE_BUY, quantity, price, received_at)
+        elif current_signal == 'short':
+            await open_position(strategy, SIDE_SELL, quantity, price, received_at)
+        set_last_signal(strategy, current_signal)
+        logging.info("Opened new %s position on %s", current_signal, symbol)
+    
+    # Only change position on crossover (when signal changes)
+    elif current_signal != strategy.last_signal:
+        if current_signal == 'long':          # BUY signal
+            if position < Decimal('0'):  # If we have a short position, close and reverse in one order
+                await open_position(strategy, SIDE_BUY, quantity, price, received_at, close_quantity=abs(position))
+        elif current_signal == 'short':        # Sell signal
+            if position > Decimal('0'):  # If we have a long position, close and reverse in one order
+                await open_position(strategy, SIDE_SELL, quantity, price, received_at, close_quantity=abs(position))
+        
+        # Update last signal
+        set_last_signal(strategy, current_signal)
+        logging.info("%s signal changed to: %s", strategy.stream, current_signal)
+
+def set_last_signal(strategy, signal):
+    """Remember the signal acted on, across restarts too"""
+    if signal == strategy.last_signal:
+        return
+    strategy.last_signal = signal
+    if state_store is not None:
+        state_store.record_signal(strategy)
+
+def cap_to_liquidity(symbol, side, quantity, close_quantity=Decimal('0')):
+    """Shrink the opening part of an order so its estimated slippage stays within MAX_SLIPPAGE_BPS"""
+    book = order_books.get(symbol)
+    if book is None or not MAX_SLIPPAGE_BPS or quantity <= 0:
+        return quantity  # No synced book: trade as before rather than not at all
+    if (book.best_ask() if side == SIDE_BUY else book.best_bid()) is None:
+        return quantity  # Nothing on the side we take, which tells us no more than having no book
+    try:
+        available = Decimal(str(book.max_quantity(side, MAX_SLIPPAGE_BPS)))
+        if close_quantity + quantity <= available:
+            return quantity
+        # Closing the old position always goes through in full; only new exposure is reduced
+        capped = exchange_filters.get(symbol).round_quantity(max(available - close_quantity, Decimal('0')))
+        estimated = book.estimate_fill(side, float(close_quantity + quantity))
+        spread = book.spread_bps()
+        logging.warning("%s %s %s capped to %s: only %.3f fills within %s bps of the best price "
+                        "(estimated fill %s, spread %s bps)", symbol, side, quantity, capped, available,
+                        MAX_SLIPPAGE_BPS, estimated, f"{spread:.1f}" if spread is not None else "n/a")
+        ORDERS_CAPPED.inc()
+        return capped
+    except Exception as e:
+        # A failed cap must never hold back the order, least of all the close of the old position
+        logging.error(f"Error capping {symbol} order to liquidity: {e}")
+        return quantity
+
+async def open_position(strategy, side, quantity, signal_price, received_at=None, close_quantity=Decimal('0')):
+    """Open, or close and reverse into, a position with one net market order, then attach its stop loss"""
+    symbol = strategy.symbol
+    quantity = cap_to_liquidity(symbol, side, quantity, close_quantity)
+    if quantity > 0 and not exchange_filters.get(symbol).meets_min_notional(quantity, signal_price):
+        # The exchange would reject it; still close the old position if there is one
+        logging.warning(f"{symbol} order of {quantity} at {signal_price} is below the minimum notional")
+        quantity = Decimal('0')
+    if quantity <= 0 and close_quantity <= 0:
+        return
+    
+    # Stops protecting the old position
+    stale_stops = [order_id for order_id, order in account_state.open_orders.items()
+                   if order['symbol'] == symbol and order['type'] == FUTURE_ORDER_TYPE_STOP_MARKET]
+    order_sent = time.perf_counter()
+    order = await place_order(symbol, side, close_quantity + quantity)
+    filled = time.perf_counter()
+    if order is None:
+        return  # The old position is still open, so its stops stay in place
+    
+    if received_at is not None:
+        SIGNAL_TO_FILL_SECONDS.observe(filled - received_at)
+        logging.info("⏱️ %s signal-to-fill latency: %.1f ms (order round-trip %.1f ms)",
+                     symbol, (filled - received_at) * 1000, (filled - order_sent) * 1000)
+    
+    # Stop from the actual fill price, sized to the position the fill left (less than asked on a partial fill)
+    fill_price = float(order.get('avgPrice') or 0) or signal_price
+    position = get_position(symbol)
+    opened = position if side == SIDE_BUY else -position
+    if opened > 0:
+        # The old position is gone; cancel its stops while the new one is placed
+        await asyncio.gather(
+            place_stop_loss(strategy, fill_price, side, opened),
+            cancel_orders(symbol, stale_stops)
+        )
+    elif opened == 0:
+        await cancel_orders(symbol, stale_stops)
+    else:
+        # Only part of the old position was closed; its reduce-only stops still protect the rest
+        logging.warning(f"{symbol} reversal only partly filled, {abs(position)} of the old position is still open")
+
+async def cancel_orders(symbol, order_ids):
+    for order_id in order_ids:
+        try:
+            await client.futures_cancel_order(symbol=symbol, orderId=order_id)
+            account_state.open_orders.pop(order_id, None)
+            if state_store is not None:
+                state_store.forget_stop(symbol, order_id)
+            logging.info(f"Cancelled {symbol} order {order_id}")
+        except Exception as e:
+            logging.error(f"Error cancelling {symbol} order {order_id}: {e}")
+
+async def fetch_closed_candles(strategy, start_time=None, limit=None):
+    """Fetch closed klines for a pair over REST, oldest first"""
+    params = {'symbol': strategy.symbol, 'interval': strategy.timeframe, 'limit': limit or strategy.warmup_candles}
+    if start_time is not None:
+        params['startTime'] = start_time
+    rows = await client.futures_klines(**params)
+    now_ms = int(time.time() * 1000)
+    # The newest row is usually the still-open candle
+    return [Candle.from_rest(row) for row in rows if int(row[6]) < now_ms]
+
+def store_candles(strategy, candles):
+    """Append closed candles to the pair's kline store, gap-filling over REST if any are missing"""
+    store = kline_stores.get(strategy.stream)
+    if store is None or not candles:
+        return
+    interval_ms = interval_to_milliseconds(strategy.timeframe)
+    if store.last_open_time is not None and candles[0].open_time > store.last_open_time + interval_ms:
+        # Appends must stay contiguous; the sync fetches these candles along with the missing ones
+        schedule_kline_sync(strategy)
+        return
+    try:
+        store.append(candles)
+    except OSError as e:
+        logging.error(f"Error writing klines for {strategy.stream}: {e}")
+
+def schedule_kline_sync(strategy):
+    task = kline_syncs.get(strategy.stream)
+    if task is None or task.done():
+        kline_syncs[strategy.stream] = asyncio.create_task(fill_kline_gap(strategy))
+
+async def fill_kline_gap(strategy):
+    try:
+        await sync_kline_store(strategy)
+    except Exception as e:
+        logging.error(f"Error syncing kline store for {strategy.stream}: {e}")
+
+async def sync_kline_store(strategy):
+    """Download every closed candle the pair's store is missing, up to now"""
+    store = kline_stores.get(strategy.stream)
+    if store is None:
+        return
+    interval_ms = interval_to_milliseconds(strategy.timeframe)
+    if store.last_open_time is not None:
+        start_time = store.last_open_time + interval_ms
+    else:
+        start_time = (int(time.time() * 1000) // interval_ms - KLINE_HISTORY) * interval_ms
+    added = 0
+    while start_time < time.time() * 1000 - interval_ms:
+        candles = await fetch_closed_candles(strategy, start_time=start_time, limit=KLINES_PER_REQUEST)
+        if not candles:
+            break
+        added += store.append(candles)
+        start_time = candles[-1].open_time + interval_ms
+    if added:
+        logging.info(f"{strategy.stream}: stored {added} candles from REST ({len(store)} on disk)")
+
+async def backfill_candles(strategy, attempts=3):
+    """Bring a pair's indicators up to date, retrying with backoff before the stream is read.
+
+    If every attempt fails the pair's history is dropped, so it waits for a full
+    window of live candles instead of trading on averages with a gap in them.
+    """
+    for attempt in range(attempts):
+        try:
+            await load_closed_candles(strategy)
+            return
+        except Exception as e:
+            logging.error(f"Error backfilling candles for {strategy.stream} (attempt {attempt + 1}/{attempts}): {e}")
+            if attempt + 1 < attempts:
+                await asyncio.sleep(2 ** attempt)
+    strategy.reset()
+    message = f"❌ <b>Backfill Failed</b>\n"
+    message += f"Pair: {strategy.symbol} {strategy.timeframe}\n"
+    message += f"No signals until {strategy.long_window} live candles have closed"
+    send_telegram_message(message)
+
+async def load_closed_candles(strategy):
+    """Load closed candles into a pair's indicators: a full warm-up, or just the gap since the last one"""
+    indicators = strategy.indicators
+    last_open_time = strategy.candles.last_closed_open_time
+    interval_ms = interval_to_milliseconds(strategy.timeframe)
+    missed = (time.time() * 1000 - last_open_time) // interval_ms if last_open_time is not None else None
+    store = kline_stores.get(strategy.stream)
+    if store is not None:
+        # Bring the store up to date, then read from local disk instead of REST
+        await sync_kline_store(strategy)
+    
+    if missed is None or missed > strategy.warmup_candles:
+        # Nothing recent enough to extend, load a fresh window
+        indicators.reset()
+        if store is not None:
+            new_candles = store.candles(count=strategy.warmup_candles)
+        else:
+            new_candles = await fetch_closed_candles(strategy, limit=strategy.warmup_candles + 1)
+    elif store is not None:
+        new_candles = store.candles(start=last_open_time + interval_ms)
+    else:
+        new_candles = await fetch_closed_candles(strategy, start_time=last_open_time + interval_ms,
+                                                 limit=strategy.warmup_candles + 1)
+    
+    loaded = 0
+    for candle in new_candles:
+        if strategy.apply_closed_candle(candle):
+            loaded += 1
+            if state_store is not None:
+                state_store.record_candle(strategy, candle)
+    logging.info(f"{strategy.stream}: backfilled {loaded} candles ({len(indicators)}/{strategy.long_window} data points)")
 
-def on_close(ws, close_status_code, close_msg):
-    print("WebSocket connection closed")
+def on_error(error):
+    logging.error("WebSocket error: %s", error)
 
-def on_open(ws):
-    print("WebSocket connection opened")
+def on_close(reason, delay):
+    logging.warning("WebSocket connection closed: %s", reason)
+    message = "⚠️ <b>WebSocket Connection Lost</b>\n"
+    message += f"Reason: {reason}\n"
+    message += f"Last message received: {datetime.fromtimestamp(last_websocket_message).strftime('%Y-%m-%d %H:%M:%S')}\n"
+    message += f"Reconnecting in {delay:.0f} seconds, open positions are kept..."
+    send_telegram_message(message)
+
+async def on_open():
+    logging.info("WebSocket connection opened")
     
-    # Subscribe to klines stream
-    subscribe_message = {
-        "method": "SUBSCRIBE",
-        "params": [f"{symbol.lower()}@kline_{timeframe}"],
-        "id": 1
-    }
-    ws.send(json.dumps(subscribe_message))
-
-def get_position():
+    # Set leverage (once per symbol, so reconnects only retry failures), warm up or fill any
+    # candles that closed while we were disconnected and reload the order books, all at once;
+    # pushes queue up meanwhile. The combined-stream URL already subscribes to every pair's klines.
+    await asyncio.gather(setup_leverage(), order_books.sync(client),
+                         *(backfill_candles(strategy) for strategy in strategies))
+
+def on_frame(frame):
+    """Hand a market data frame to the strategy worker; called for every frame received"""
+    global last_websocket_message
+    last_websocket_message = time.time()
+    if recorder is not None:
+        recorder.write('market', frame)
+    if order_books.on_frame(frame):
+        return  # Depth diffs must all be applied in order, so they never wait in the conflating queue
+    frame_queue.put(frame)
+
+def get_position(symbol):
+    # Get current position from the account state cache
+    with GET_POSITION_SPAN.time():
+        return account_state.position_amount(symbol)
+
+async def refresh_account_state():
+    """Re-seed the account state cache over REST"""
+    try:
+        await account_state.seed(client, strategies.symbols)
+        if state_store is not None:
+            state_store.prune_stops(account_state.open_orders)
+        logging.info("Account state refreshed from REST")
+    except Exception as e:
+        logging.error(f"Error refreshing account state: {e}")
+
+async def reconcile_saved_stops():
+    """Warm start: keep the stop-loss orders saved before the restart that still protect a
+    position, cancel the ones left behind by a position that is gone, and stop any position left without one"""
+    for symbol in strategies.symbols:
+        position = account_state.position(symbol)
+        amount = position.amount if position else Decimal('0')
+        protecting_side = SIDE_SELL if amount > 0 else SIDE_BUY
+        adopted, orphaned = [], []
+        for order_id in sorted(state_store.stop_orders.get(symbol, ())):
+            order = account_state.open_orders.get(order_id)
+            if order is None:
+                continue
+            if amount != 0 and order['side'] == protecting_side:
+                adopted.append(order_id)
+            else:
+                orphaned.append(order_id)
+        if orphaned:
+            logging.warning(f"Cancelling {len(orphaned)} {symbol} stop orders left from before the restart")
+            await cancel_orders(symbol, orphaned)
+        if adopted:
+            logging.info(f"Adopted {symbol} stop orders {adopted} from before the restart")
+        elif amount != 0 and not any(order['symbol'] == symbol and order['side'] == protecting_side
+                                     and order['type'] == FUTURE_ORDER_TYPE_STOP_MARKET
+                                     for order in account_state.open_orders.values()):
+            logging.warning(f"{symbol} position of {amount} has no stop loss, placing one")
+            await place_stop_loss(strategies.for_symbol(symbol)[0], position.entry_price,
+                                  SIDE_BUY if amount > 0 else SIDE_SELL, abs(amount))
+
+async def reconcile_account_state():
+    """Periodically correct any drift between the cache and the exchange"""
+    while True:
+        await asyncio.sleep(ACCOUNT_RECONCILE_INTERVAL)
+        await refresh_account_state()
+        await refresh_exchange_filters()
+
+async def refresh_exchange_filters():
+    """Reload symbol filters once the cached copy has expired"""
+    if not exchange_filters.stale:
+        return
     try:
-        # Get current position from futures account
-        position_info = client.futures_position_information(symbol=symbol)
-        if position_info:
-            return Decimal(position_info[0]['positionAmt'])
-        return Decimal('0')
+        await exchange_filters.load(client)
     except Exception as e:
-        print(f"Error getting position: {e}")
-        return Decimal('0')
+        logging.error(f"Error loading exchange info: {e}")
+
+async def keep_listen_key_alive(listen_key):
+    while True:
+        await asyncio.sleep(LISTEN_KEY_KEEPALIVE_INTERVAL)
+        try:
+            await client.futures_stream_keepalive(listenKey=listen_key)
+        except Exception as e:
+            logging.error(f"Error keeping listen key alive: {e}")
+
+async def run_user_data_stream():
+    """Keep the account state cache current from the futures user-data stream"""
+    backoff = Backoff()
+    while True:
+        keepalive_task = None
+        try:
+            listen_key = await client.futures_stream_get_listen_key()
+            async with http_session.ws_connect(f"wss://fstream.binance.com/ws/{listen_key}", heartbeat=20) as ws:
+                logging.info("User data stream opened")
+                backoff.reset()
+                keepalive_task = asyncio.create_task(keep_listen_key_alive(listen_key))
+                
+                # Events may have been missed while disconnected; new ones queue up meanwhile
+                await refresh_account_state()
+                account_state.live = True
+                
+                async for msg in ws:
+                    if msg.type == aiohttp.WSMsgType.ERROR:
+                        on_error(ws.exception())
+                        break
+                    if msg.type in (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSING, aiohttp.WSMsgType.CLOSED):
+                        break
+                    if msg.type != aiohttp.WSMsgType.TEXT:
+                        continue
+                    if recorder is not None:
+                        recorder.write('user', msg.data)
+                    event = decoder.decode(msg.data)
+                    if 'E' in event:
+                        USER_EVENT_LAG.observe(time.time() - event['E'] / 1000)
+                    if event.get('e') == 'listenKeyExpired':
+                        logging.warning("Listen key expired, reconnecting user data stream...")
+                        break
+                    account_state.apply_event(event)
+                if ws.closed:
+                    # A normal disconnect, e.g. Binance's 24 hour limit; reconnect like after any other
+                    logging.warning("User data stream closed (code %s), reconnecting...", ws.close_code)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"User data stream error: {e}")
+        finally:
+            account_state.live = False
+            if keepalive_task is not None:
+                keepalive_task.cancel()
+        await asyncio.sleep(backoff.next())  # Wait before reconnecting
+
+async def find_order(symbol, client_order_id, attempts=5):
+    """Look up an order whose placement timed out; None if the exchange never accepted it"""
+    from binance.exceptions import BinanceAPIException
+    for attempt in range(attempts):
+        try:
+            return await client.futures_get_order(symbol=symbol, origClientOrderId=client_order_id)
+        except BinanceAPIException as e:
+            if e.code != -2013:  # Order does not exist (yet)
+                raise
+        await asyncio.sleep(0.25 * 2 ** attempt * (0.5 + random.random()))
+    return None
 
-def place_order(side, quantity):
+async def place_order(symbol, side, quantity):
+    """Send a market order; returns the order response, or None if it failed"""
+    from binance.exceptions import BinanceAPIException
+    quantity = exchange_filters.get(symbol).round_quantity(quantity)
+    # Our own id for the order, so it can be looked up if the response is lost
+    client_order_id = uuid.uuid4().hex
+    title = "Order Placed"
     try:
         # Log order attempt
-        logging.info(f"🔄 Attempting to place order: Side={'BUY' if side == SIDE_BUY else 'SELL'}, Quantity={quantity}")
+        logging.info("🔄 Attempting to place order: Symbol=%s, Side=%s, Quantity=%s", symbol, side, quantity)
         
         try:
-            order = client.futures_create_order(
+            order = await client.futures_create_order(
                 symbol=symbol,
                 side=side,
                 type=ORDER_TYPE_MARKET,
-                quantity=quantity
+                quantity=format(quantity, 'f'),
+                newClientOrderId=client_order_id,
+                newOrderRespType='RESULT'  # Include the fill in the response
             )
-        except APIError as e:
-            # Check if it's a timeout error (-1007)
-            if e.code == -1007:
-                logging.warning("⚠️ Order timeout (-1007) - Checking if order was actually placed...")
-                
-                # Wait a moment for the order to potentially process
-                time.sleep(2)
-                
-                # Get current position to check if order went through
-                current_position = get_position()
-                expected_position = quantity if side == SIDE_BUY else -quantity
-                
-                # If position matches what we expected, order went through
-                if abs(current_position) == abs(expected_position):
-                    logging.info("✅ Order actually went through despite timeout")
-                    message = f"🟢 <b>Order Placed (Recovered from Timeout)</b>\n"
-                    message += f"Symbol: {symbol}\n"
-                    message += f"Side: {'BUY' if side == SIDE_BUY else 'SELL'}\n"
-                    message += f"Quantity: {quantity}\n"
-                    message += f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-                    send_telegram_message(message)
-                    return
-                
-                # If position didn't change, order didn't go through
-                logging.error("❌ Order did not go through - will retry")
-                raise e  # Re-raise to trigger retry
+        except BinanceAPIException as e:
+            # Anything but a timeout (-1007) is a definite failure
+            if e.code != -1007:
+                raise
+            logging.warning("⚠️ Order timeout (-1007) - Checking if order was actually placed...")
             
-            # For other API errors, just raise them
-            raise e
-        except Exception as e:
-            # For non-API errors, just raise them
-            raise e
+            # The order may still have reached the matching engine; ask for it by id
+            order = await find_order(symbol, client_order_id)
+            if order is None:
+                logging.error("❌ Order did not go through")
+                raise
+            
+            logging.info("✅ Order actually went through despite timeout")
+            title = "Order Placed (Recovered from Timeout)"
         
         # If we get here, order was successful
-        message = f"🟢 <b>Order Placed</b>\n"
+        account_state.apply_fill(symbol, int(order['orderId']), side, Decimal(order.get('executedQty', '0')),
+                                 float(order.get('avgPrice') or 0), int(order.get('updateTime') or 0))
+        
+        message = f"🟢 <b>{title}</b>\n"
         message += f"Symbol: {symbol}\n"
         message += f"Side: {'BUY' if side == SIDE_BUY else 'SELL'}\n"
         message += f"Quantity: {quantity}\n"
         message += f"Price: {order.get('avgPrice', 'N/A')}\n"
         message += f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
         send_telegram_message(message)
-        logging.info(f"✅ Order placed successfully: {order}")
+        logging.info("✅ Order placed successfully: %s", order,
+                     extra={'event': 'order', 'symbol': symbol, 'side': side, 'quantity': quantity,
+                            'order_id': order.get('orderId'), 'avg_price': order.get('avgPrice')})
+        return order
         
     except Exception as e:
         error_message = f"❌ <b>Order Error</b>\n"
@@ -437,32 +936,36 @@ def place_order(side, quantity):
         error_message += f"Error: {str(e)}"
         send_telegram_message(error_message)
         logging.error(f"❌ Failed to place order: {str(e)}")
+        return None
 
-def close_all_positions():
+async def close_all_positions():
+    await asyncio.gather(*(close_position(symbol) for symbol in strategies.symbols))
+
+async def close_position(symbol):
     try:
-        position = get_position()
+        position = get_position(symbol)
         if position > 0:  # Long position
-            place_order(SIDE_SELL, abs(position))
+            await place_order(symbol, SIDE_SELL, abs(position))
             message = f"🔴 <b>Position Closed</b>\n"
             message += f"Symbol: {symbol}\n"
             message += f"Type: Long\n"
             message += f"Quantity: {abs(position)}\n"
             message += f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
             send_telegram_message(message)
-            logging.info("Closed long position")
+            logging.info(f"Closed long {symbol} position")
         elif position < 0:  # Short position
-            place_order(SIDE_BUY, abs(position))
+            await place_order(symbol, SIDE_BUY, abs(position))
             message = f"🔴 <b>Position Closed</b>\n"
             message += f"Symbol: {symbol}\n"
             message += f"Type: Short\n"
             message += f"Quantity: {abs(position)}\n"
             message += f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
             send_telegram_message(message)
-            logging.info("Closed short position")
+            logging.info(f"Closed short {symbol} position")
         else:
-            message = "ℹ️ No positions to close"
+            message = f"ℹ️ No {symbol} position to close"
             send_telegram_message(message)
-            logging.info("No positions to close")
+            logging.info(f"No {symbol} position to close")
     except Exception as e:
         error_message = f"❌ <b>Error Closing Position</b>\n"
         error_message += f"Symbol: {symbol}\n"
@@ -473,105 +976,138 @@ def close_all_positions():
 async def run_telegram_bot():
         
     global telegram_app
-    telegram_app = Application.builder().token(TELEGRAM_TOKEN).build()
-    telegram_app.add_handler(CommandHandler("start", start))
-    telegram_app.add_handler(CommandHandler("status", check_position_command))
-    telegram_app.add_handler(CallbackQueryHandler(button_callback))
+    telegram_ext = await import_off_loop('telegram.ext')
+    telegram_app = telegram_ext.Application.builder().token(TELEGRAM_TOKEN).build()
+    telegram_app.add_handler(telegram_ext.CommandHandler("start", start))
+    telegram_app.add_handler(telegram_ext.CommandHandler("status", check_position_command))
+    telegram_app.add_handler(telegram_ext.CallbackQueryHandler(button_callback))
     
-    # Start the bot
+    # Start the bot on the shared event loop
     await telegram_app.initialize()
     await telegram_app.start()
-    await telegram_app.run_polling()
+    await telegram_app.updater.start_polling()
+    try:
+        await asyncio.Event().wait()  # Poll until cancelled
+    finally:
+        await telegram_app.updater.stop()
+        await telegram_app.stop()
+        await telegram_app.shutdown()
 
-def run_trading_bot():
+async def run_strategy_worker():
+    """Process queued market data frames, so the receive loop never waits on orders or REST calls"""
+    while True:
+        frame, received_at = await frame_queue.get()
+        await on_message(frame, received_at)
+
+async def run_trading_bot():
     """Run the trading bot"""
+    global market_stream
     # Send startup message
     startup_message = f"🚀 <b>Trading Bot Started</b>\n"
-    startup_message += f"Symbol: {symbol}\n"
-    startup_message += f"Leverage: {leverage}x\n"
-    startup_message += f"Account Usage: {ACCOUNT_USAGE_PERCENTAGE}%\n"
-    startup_message += f"Stop Loss: {STOP_LOSS_PERCENTAGE}%\n"
+    for strategy in strategies:
+        startup_message += f"{strategy.symbol} {strategy.timeframe}: "
+        startup_message += f"Leverage {strategy.leverage}x, "
+        startup_message += f"Account Usage {strategy.account_usage_percentage:g}%, "
+        startup_message += f"Stop Loss {strategy.stop_loss_percentage}%\n"
     startup_message += f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
     send_telegram_message(startup_message)
     
-    while True:  # Main loop for reconnection
+    # Seed the account state cache and symbol filters before trading on them, and settle the
+    # stop orders saved before a restart. Leverage, order books and indicator warm-up are
+    # handled by on_open() once the stream connects.
+    await asyncio.gather(refresh_account_state(), refresh_exchange_filters())
+    if account_state.seeded_at is not None:
+        await reconcile_saved_stops()
+    
+    # One combined websocket connection for all pairs, pinging every 20 seconds and
+    # reconnecting with backoff; rotated through an overlapping standby before the 24h cut
+    market_stream = StreamSupervisor(
+        http_session,
+        strategies.combined_stream_url(extra_streams=strategies.mark_price_streams + order_books.streams),
+        on_frame,
+        on_connect=on_open,
+        on_disconnect=on_close,
+        timeout=WEBSOCKET_TIMEOUT,
+        max_age=WEBSOCKET_MAX_AGE
+    )
+    backoff = Backoff()
+    while True:
         try:
-            # Setup leverage and margin type
-            setup_leverage()
-            
-            # Initialize websocket connection
-            websocket.enableTrace(False)  # Disable WebSocket trace messages
-            ws = websocket.WebSocketApp(
-                f"wss://fstream.binance.com/ws/{symbol.lower()}@kline_{timeframe}",
-                on_message=on_message,
-                on_error=on_error,
-                on_close=on_close,
-                on_open=on_open
-            )
-            
-            # Start connection monitor thread
-            def connection_monitor():
-                while True:
-                    time.sleep(10)  # Check every 10 seconds
-                    current_time = time.time()
-                    if current_time - last_websocket_message > WEBSOCKET_TIMEOUT:
-                        message = "⚠️ <b>WebSocket Connection Lost</b>\n"
-                        message += f"Last message received: {datetime.fromtimestamp(last_websocket_message).strftime('%Y-%m-%d %H:%M:%S')}\n"
-                        message += "Attempting to reconnect..."
-                        send_telegram_message(message)
-                        logging.warning(f"WebSocket connection stale (last message: {last_websocket_message}), restarting...")
-                        ws.close()
-                        break
-            
-            monitor_thread = threading.Thread(target=connection_monitor)
-            monitor_thread.daemon = True
-            monitor_thread.start()
-            
-            # Run websocket with ping settings
-            ws.run_forever(ping_interval=20, ping_timeout=10)
-            
-        except KeyboardInterrupt:
-            message = "🛑 <b>Bot Stopped by User</b>\nClosing all positions..."
-            send_telegram_message(message)
-            logging.info("\nProgram terminated by user")
-            close_all_positions()
-            message = "✅ <b>Bot Stopped</b>\nAll positions closed successfully."
-            send_telegram_message(message)
-            logging.info("All positions closed. Program ended.")
-            break
+            await market_stream.run()
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
-            error_message = f"❌ <b>Unexpected Error</b>\n{str(e)}\nAttempting to restart in 60 seconds..."
+            # Positions stay open behind their exchange-side stop losses; state is on disk
+            delay = backoff.next()
+            error_message = f"❌ <b>Unexpected Error</b>\n{str(e)}\nReconnecting in {delay:.0f} seconds, open positions are kept..."
             send_telegram_message(error_message)
             logging.error(f"Unexpected error: {e}")
-            close_all_positions()
-            logging.info("All positions closed. Attempting to restart in 60 seconds...")
-            time.sleep(60)  # Wait before reconnecting
+            await asyncio.sleep(delay)  # Wait before reconnecting
+
+async def stop_trading_bot():
+    """Close all positions when the bot is stopped by the user"""
+    message = "🛑 <b>Bot Stopped by User</b>\nClosing all positions..."
+    send_telegram_message(message)
+    logging.info("\nProgram terminated by user")
+    await close_all_positions()
+    message = "✅ <b>Bot Stopped</b>\nAll positions closed successfully."
+    send_telegram_message(message)
+    logging.info("All positions closed. Program ended.")
+
+def log_web_server_exit(task):
+    if not task.cancelled() and task.exception() is not None:
+        logging.error(f"Web server stopped, /health and /metrics are unavailable: {task.exception()}")
 
 async def main():
-    """Main async function to run all components"""
-    # Start Flask in a separate thread
-    flask_thread = threading.Thread(target=run_flask, daemon=True)
-    flask_thread.start()
+    """Run every component as a task on a single event loop"""
+    global client, http_session, state_store
+    client = RateLimitedClient(factory=create_binance_client)
+    # python-binance loads in a worker thread while the rest of startup runs; the first REST call waits for it
+    client.start_creating()
+    http_session = aiohttp.ClientSession()
     
-    # Start Telegram bot
-    telegram_task = asyncio.create_task(run_telegram_bot())
+    # Start the Telegram notification worker
+    notifier.start()
     
-    # Start trading bot in a separate thread
-    trading_thread = threading.Thread(target=run_trading_bot, daemon=True)
-    trading_thread.start()
+    # Warm restart: candles since the saved state are backfilled when trading starts
+    state_store = StateStore(STATE_DB, strategies)
+    restored = state_store.load()
+    logging.info(f"Restored saved state for {restored}/{len(strategies)} pairs from {STATE_DB}")
     
-    # Wait for Telegram bot to complete (it won't unless there's an error)
-    await telegram_task
+    # Local kline history; backfills read from here and only download what is missing
+    for strategy in strategies:
+        kline_stores[strategy.stream] = KlineStore.for_stream(KLINE_DIR, strategy.symbol, strategy.timeframe)
+    
+    # The health and metrics endpoints are not needed to trade, so a failure to import or bind is only logged
+    web_server = asyncio.create_task(run_web_server())
+    web_server.add_done_callback(log_web_server_exit)
+    
+    try:
+        await asyncio.gather(
+            run_telegram_bot(),
+            run_user_data_stream(),  # Keep account state current, reconciling over REST
+            reconcile_account_state(),
+            run_strategy_worker(),
+            run_trading_bot()
+        )
+    except asyncio.CancelledError:
+        # Ctrl+C cancels the main task
+        await stop_trading_bot()
+        raise
+    finally:
+        web_server.cancel()
+        await asyncio.gather(web_server, return_exceptions=True)
+        if recorder is not None:
+            recorder.close()
+        state_store.close()
+        await notifier.stop()
+        await http_session.close()
+        await client.close_connection()
 
 if __name__ == "__main__":
-    # Create event loop
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    
     try:
-        # Run main async function
-        loop.run_until_complete(main())
+        asyncio.run(main())
     except KeyboardInterrupt:
         logging.info("Shutting down...")
     finally:
-        loop.close()
+        log_listener.stop()  # Flush queued records
@@ -0,0 +1,183 @@
+"""Background Telegram notifications that never block the trading path."""
+import asyncio
+import collections
+import logging
+import random
+import time
+from typing import Optional
+
+import aiohttp
+
+from metrics import REGISTRY
+
+TELEGRAM_MAX_MESSAGE_LENGTH = 4096
+BATCH_SEPARATOR = "\n\n"
+
+SEND_SECONDS = REGISTRY.histogram('bot_telegram_send_seconds', "Telegram sendMessage round-trip time")
+
+
+class TelegramNotifier:
+    """Queue of outgoing messages drained by a task on the event loop.
+
+    Messages that arrive within ``batch_window`` of each other are merged into
+    one Telegram message. Sends are spaced to stay under Telegram's per-chat
+    limits, and 429 responses are retried after the advertised ``retry_after``.
+    When the queue is full the oldest message is dropped; the count is
+    reported in the next message that goes out.
+    """
+
+    def __init__(self, token: Optional[str], chat_id: Optional[str], max_queue: int = 200,
+                 batch_window: float = 1.0, min_interval: float = 1.0, max_per_minute: int = 20,
+                 max_retries: int = 5, timeout: float = 10.0):
+        self.token = token
+        self.chat_id = chat_id
+        self.batch_window = batch_window
+        self.min_interval = min_interval
+        self.max_per_minute = max_per_minute
+        self.max_retries = max_retries
+        self.timeout = timeout
+
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._carry: Optional[str] = None  # Message that did not fit in the previous batch
+        self._send_times = collections.deque(maxlen=max_per_minute)
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+        # Accounting
+        self.sent = 0
+        self.merged = 0
+        self.dropped = 0
+        self.failed = 0
+        self._unreported_drops = 0
+
+    @property
+    def url(self) -> str:
+        return f"https://api.telegram.org/bot{self.token}/sendMessage"
+
+    def start(self) -> None:
+        """Start the worker task; must be called from the running event loop."""
+        if self._task is not None and not self._task.done():
+            return
+        self._stopping = False
+        self._task = asyncio.create_task(self._run(), name='telegram-notifier')
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        """Stop the worker after it has sent what is queued, waiting at most ``timeout``."""
+        self._stopping = True
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+
+    def send(self, message: str) -> None:
+        """Queue a message without waiting."""
+        while True:
+            try:
+                self._queue.put_nowait(message)
+                return
+            except asyncio.QueueFull:
+                try:
+                    self._queue.get_nowait()
+                    self.dropped += 1
+                    self._unreported_drops += 1
+                except asyncio.QueueEmpty:
+                    pass
+
+    def stats(self) -> dict:
+        return {
+            'queued': self._queue.qsize(),
+            'sent': self.sent,
+            'merged': self.merged,
+            'dropped': self.dropped,
+            'failed': self.failed,
+        }
+
+    async def _run(self) -> None:
+        # One keep-alive connection is plenty for a single chat
+        connector = aiohttp.TCPConnector(limit=1)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            while True:
+                batch = await self._next_batch()
+                if batch is None:
+                    if self._stopping:
+                        return
+                    continue
+                await self._wait_for_rate_limit()
+                await self._deliver(session, batch)
+
+    async def _next_batch(self) -> Optional[str]:
+        """Wait for the first message, then merge whatever arrives within the batch window."""
+        if self._carry is not None:
+            parts, self._carry = [self._carry], None
+        else:
+            try:
+                parts = [await asyncio.wait_for(self._queue.get(), 0.5)]
+            except asyncio.TimeoutError:
+                return None
+
+        length = len(parts[0])
+        deadline = time.monotonic() + self.batch_window
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    message = await asyncio.wait_for(self._queue.get(), remaining)
+                else:
+                    message = self._queue.get_nowait()
+            except (asyncio.TimeoutError, asyncio.QueueEmpty):
+                break
+            if length + len(BATCH_SEPARATOR) + len(message) > TELEGRAM_MAX_MESSAGE_LENGTH:
+                self._carry = message
+                break
+            parts.append(message)
+            length += len(BATCH_SEPARATOR) + len(message)
+
+        self.merged += len(parts) - 1
+        if self._unreported_drops:
+            parts.append(f"⚠️ {self._unreported_drops} notification(s) dropped")
+            self._unreported_drops = 0
+        return BATCH_SEPARATOR.join(parts)[:TELEGRAM_MAX_MESSAGE_LENGTH]
+
+    async def _wait_for_rate_limit(self) -> None:
+        now = time.monotonic()
+        wait = 0.0
+        if self._send_times:
+            wait = self._send_times[-1] + self.min_interval - now
+            if len(self._send_times) == self.max_per_minute:
+                wait = max(wait, self._send_times[0] + 60 - now)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    async def _deliver(self, session: aiohttp.ClientSession, text: str) -> None:
+        data = {
+            "chat_id": self.chat_id,
+            "text": text,
+            "parse_mode": "HTML"
+        }
+        for attempt in range(self.max_retries):
+            try:
+                started = time.perf_counter()
+                async with session.post(self.url, data=data) as response:
+                    SEND_SECONDS.observe(time.perf_counter() - started)
+                    self._send_times.append(time.monotonic())
+                    if response.status == 200:
+                        self.sent += 1
+                        return
+                    body = await response.text()
+                    if response.status == 429:
+                        retry_after = (await response.json()).get('parameters', {}).get('retry_after', 1)
+                        logging.warning(f"Telegram rate limited, retrying in {retry_after}s")
+                        await asyncio.sleep(retry_after)
+                        continue
+                    if response.status < 500:
+                        # Bad request (e.g. malformed HTML), retrying will not help
+                        logging.error(f"Failed to send Telegram message: {body}")
+                        break
+                    logging.error(f"Telegram server error {response.status}: {body}")
+            except Exception as e:
+                logging.error(f"Error sending Telegram message: {e}")
+            await asyncio.sleep(min(30, 2 ** attempt) * (0.5 + random.random()))
+        self.failed += 1
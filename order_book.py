@@ -0,0 +1,268 @@
+"""Local order books kept from the diff depth stream, in sorted NumPy arrays.
+
+Each book follows Binance's futures procedure: diffs from
+``<symbol>@depth@100ms`` are buffered until a REST snapshot arrives, diffs
+older than the snapshot are dropped, the first diff applied must straddle the
+snapshot's ``lastUpdateId``, and from then on every diff's ``pu`` must equal
+the previous diff's ``u``. A gap marks the book out of sync and fetches a new
+snapshot.
+
+Each side is a pair of float64 arrays (price, quantity) sorted by price
+ascending, so a diff is applied with one ``searchsorted`` and an insert
+rather than per-level dict updates, and fill estimates are a ``cumsum``
+over contiguous memory.
+"""
+import asyncio
+import logging
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+DEPTH_MARKER = '"e":"depthUpdate"'
+MAX_BUFFERED_DIFFS = 1000  # ~100 s of 100 ms diffs while waiting for a snapshot
+
+
+class BookSide:
+    """Price levels of one side of the book, prices ascending."""
+
+    __slots__ = ('prices', 'quantities')
+
+    def __init__(self):
+        self.prices = np.empty(0)
+        self.quantities = np.empty(0)
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+    def load(self, levels: List[List[str]]) -> None:
+        """Replace every level, from ``[[price, quantity], ...]`` strings as the REST API returns them."""
+        update = np.array(levels, dtype=np.float64).reshape(-1, 2)
+        update = update[update[:, 1] > 0]
+        order = np.argsort(update[:, 0])
+        self.prices = update[order, 0].copy()
+        self.quantities = update[order, 1].copy()
+
+    def apply(self, levels: List[List[str]]) -> None:
+        """Set the quantity of each level in a diff; a zero quantity removes the level."""
+        if not levels:
+            return
+        update = np.array(levels, dtype=np.float64).reshape(-1, 2)
+        prices, quantities = update[:, 0], update[:, 1]
+        index = np.searchsorted(self.prices, prices)
+        found = index < len(self.prices)
+        found[found] = self.prices[index[found]] == prices[found]
+
+        self.quantities[index[found]] = quantities[found]
+        new = ~found & (quantities > 0)
+        if new.any():
+            order = np.argsort(prices[new])
+            self.prices = np.insert(self.prices, index[new][order], prices[new][order])
+            self.quantities = np.insert(self.quantities, index[new][order], quantities[new][order])
+        if (quantities[found] == 0).any():
+            keep = self.quantities > 0
+            self.prices = self.prices[keep]
+            self.quantities = self.quantities[keep]
+
+
+class OrderBook:
+    """Order book for one symbol, plus the liquidity queries used to size orders.
+
+    ``side`` in the queries is the side of the taker order: a BUY consumes
+    asks from the lowest price up, a SELL consumes bids from the highest down.
+    """
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.bids = BookSide()
+        self.asks = BookSide()
+        self.last_update_id: Optional[int] = None  # None until a snapshot is loaded
+        self.event_time = 0
+        self._bridged = False  # A diff straddling the snapshot has been applied
+        self._buffer: List[dict] = []
+
+    @property
+    def synced(self) -> bool:
+        return self.last_update_id is not None
+
+    # ------------------------------------------------------------------
+    # Updates
+    # ------------------------------------------------------------------
+    def load_snapshot(self, snapshot: dict) -> bool:
+        """Apply a REST depth snapshot and the diffs buffered meanwhile; False if they leave a gap."""
+        self.bids.load(snapshot['bids'])
+        self.asks.load(snapshot['asks'])
+        self.last_update_id = int(snapshot['lastUpdateId'])
+        self._bridged = False
+        buffered, self._buffer = self._buffer, []
+        for i, event in enumerate(buffered):
+            if not self.apply_diff(event):
+                self._buffer.extend(buffered[i + 1:])
+                return False
+        return True
+
+    def apply_diff(self, event: dict) -> bool:
+        """Apply one depthUpdate event; False if it reveals a gap, leaving the book unsynced."""
+        if self.last_update_id is None:
+            if len(self._buffer) >= MAX_BUFFERED_DIFFS:
+                del self._buffer[0]
+            self._buffer.append(event)
+            return True
+        if event['u'] < self.last_update_id:
+            return True  # Already contained in the snapshot
+        if self._bridged:
+            gap = event['pu'] != self.last_update_id
+        else:
+            gap = event['U'] > self.last_update_id
+        if gap:
+            self.last_update_id = None
+            self._buffer = [event]
+            return False
+        self.bids.apply(event['b'])
+        self.asks.apply(event['a'])
+        self.last_update_id = event['u']
+        self.event_time = event['E']
+        self._bridged = True
+        return True
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    def best_bid(self) -> Optional[float]:
+        return float(self.bids.prices[-1]) if len(self.bids) else None
+
+    def best_ask(self) -> Optional[float]:
+        return float(self.asks.prices[0]) if len(self.asks) else None
+
+    def mid(self) -> Optional[float]:
+        if not len(self.bids) or not len(self.asks):
+            return None
+        return (self.best_bid() + self.best_ask()) / 2
+
+    def spread_bps(self) -> Optional[float]:
+        mid = self.mid()
+        return (self.best_ask() - self.best_bid()) / mid * 1e4 if mid else None
+
+    def _levels(self, side: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Levels a taker order on ``side`` consumes, best price first (views, no copies)."""
+        if side == 'BUY':
+            return self.asks.prices, self.asks.quantities
+        return self.bids.prices[::-1], self.bids.quantities[::-1]
+
+    def depth_within(self, side: str, bps: float) -> float:
+        """Quantity available within ``bps`` of the best price on the side ``side`` consumes."""
+        prices, quantities = self._levels(side)
+        if not len(prices):
+            return 0.0
+        if side == 'BUY':
+            count = np.searchsorted(prices, prices[0] * (1 + bps / 1e4), side='right')
+        else:
+            count = np.searchsorted(-prices, -prices[0] * (1 - bps / 1e4), side='right')
+        return float(quantities[:count].sum())
+
+    def estimate_fill(self, side: str, quantity: float) -> Optional[float]:
+        """Average price a market order of ``quantity`` would fill at; None if the book is too thin."""
+        prices, quantities = self._levels(side)
+        if quantity <= 0 or not len(prices):
+            return None
+        filled = np.cumsum(quantities)
+        if filled[-1] < quantity:
+            return None
+        count = int(np.searchsorted(filled, quantity))  # Levels fully consumed before the last one
+        cost = float(np.dot(prices[:count], quantities[:count]))
+        remainder = quantity - (float(filled[count - 1]) if count else 0.0)
+        return (cost + remainder * float(prices[count])) / quantity
+
+    def max_quantity(self, side: str, slippage_bps: float) -> float:
+        """Largest quantity whose estimated average fill stays within ``slippage_bps`` of the best price.
+
+        The best price is the one on the side being taken (best ask for a BUY),
+        so a wide spread does not count as slippage.
+        """
+        prices, quantities = self._levels(side)
+        if not len(prices):
+            return 0.0
+        sign = 1.0 if side == 'BUY' else -1.0
+        limit = float(prices[0]) * (1 + sign * slippage_bps / 1e4)
+        filled = np.cumsum(quantities)
+        cost = np.cumsum(prices * quantities)
+        # The running average worsens level by level, so the levels within the limit are a prefix
+        count = int(np.searchsorted(sign * cost / filled, sign * limit, side='right'))
+        if count == len(prices):
+            return float(filled[-1])
+        filled_before = float(filled[count - 1]) if count else 0.0
+        cost_before = float(cost[count - 1]) if count else 0.0
+        # Take just enough of the next level to bring the average to the limit
+        partial = (limit * filled_before - cost_before) / (float(prices[count]) - limit)
+        return filled_before + max(partial, 0.0)
+
+
+class OrderBookCache:
+    """Order books for every traded symbol, fed from the combined stream.
+
+    ``on_frame`` consumes depth diffs (returning True) and leaves every other
+    frame to the caller. Snapshots are fetched by ``sync`` after each fresh
+    connection and automatically whenever a book detects a gap.
+    """
+
+    def __init__(self, symbols: Iterable[str], decode: Callable[[str], dict], snapshot_limit: int = 500):
+        self.books: Dict[str, OrderBook] = {symbol: OrderBook(symbol) for symbol in symbols}
+        self.decode = decode
+        self.snapshot_limit = snapshot_limit
+        self._client = None
+        self._resyncs: Dict[str, asyncio.Task] = {}
+
+        # Accounting
+        self.diffs = 0
+        self.gaps = 0
+        self.snapshots = 0
+
+    @property
+    def streams(self) -> List[str]:
+        return [f"{symbol.lower()}@depth@100ms" for symbol in self.books]
+
+    def get(self, symbol: str) -> Optional[OrderBook]:
+        """The book for ``symbol`` if it is in sync, else None."""
+        book = self.books.get(symbol)
+        return book if book is not None and book.synced else None
+
+    def on_frame(self, frame: str) -> bool:
+        if DEPTH_MARKER not in frame:
+            return False
+        event = self.decode(frame)['data']
+        book = self.books.get(event['s'])
+        if book is None:
+            return True
+        self.diffs += 1
+        if not book.apply_diff(event):
+            self.gaps += 1
+            logging.warning(f"{book.symbol} order book gap at update {event['U']}, resyncing")
+            self._schedule_resync(book)
+        return True
+
+    async def sync(self, client) -> None:
+        """Load fresh snapshots for every book, e.g. after reconnecting."""
+        self._client = client
+        for book in self.books.values():
+            book.last_update_id = None
+        await asyncio.gather(*(self._resync(book) for book in self.books.values()))
+
+    def _schedule_resync(self, book: OrderBook) -> None:
+        task = self._resyncs.get(book.symbol)
+        if self._client is not None and (task is None or task.done()):
+            self._resyncs[book.symbol] = asyncio.create_task(self._resync(book))
+
+    async def _resync(self, book: OrderBook, attempts: int = 3) -> None:
+        for attempt in range(attempts):
+            try:
+                snapshot = await self._client.futures_order_book(symbol=book.symbol, limit=self.snapshot_limit)
+            except Exception as e:
+                logging.error(f"Error loading {book.symbol} order book snapshot: {e}")
+                await asyncio.sleep(2 ** attempt)
+                continue
+            self.snapshots += 1
+            if book.load_snapshot(snapshot):
+                return
+            # The snapshot predates the buffered diffs; wait for the stream to catch up and retry
+            self.gaps += 1
+            await asyncio.sleep(1)
+        logging.error(f"{book.symbol} order book could not be synced, orders are not capped by liquidity")
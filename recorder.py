@@ -0,0 +1,67 @@
+"""Append-only capture of raw websocket frames for later replay.
+
+Frames go to gzip files rotated hourly, one line per frame:
+
+    <receive time, unix seconds>\\t<source>\\t<raw frame>
+
+``source`` is ``market`` for the combined kline stream and ``user`` for the
+user-data stream. Each file is flushed every few seconds, so a crash loses at
+most that much; a truncated tail is skipped by ``read_frames``.
+"""
+import gzip
+import os
+import time
+import zlib
+from datetime import datetime, timezone
+from typing import Iterable, Iterator, Tuple
+
+
+class FrameRecorder:
+    def __init__(self, directory: str, prefix: str = 'frames', flush_interval: float = 5.0,
+                 compresslevel: int = 1):
+        self.directory = directory
+        self.prefix = prefix
+        self.flush_interval = flush_interval
+        self.compresslevel = compresslevel
+        self.frames = 0
+        self._file = None
+        self._hour = None
+        self._last_flush = 0.0
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, source: str, frame: str) -> None:
+        now = time.time()
+        hour = int(now // 3600)
+        if hour != self._hour:
+            self._open(now, hour)
+        self._file.write(f"{now:.6f}\t{source}\t{frame}\n".encode())
+        self.frames += 1
+        if now - self._last_flush > self.flush_interval:
+            self._file.flush()
+            self._last_flush = now
+
+    def _open(self, now: float, hour: int) -> None:
+        self.close()
+        stamp = datetime.fromtimestamp(now, timezone.utc).strftime('%Y%m%d-%H')
+        path = os.path.join(self.directory, f"{self.prefix}-{stamp}.gz")
+        # Appending starts a new gzip member, which gzip readers concatenate transparently
+        self._file = gzip.open(path, 'ab', compresslevel=self.compresslevel)
+        self._hour = hour
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def read_frames(paths: Iterable[str]) -> Iterator[Tuple[float, str, str]]:
+    """Yield (receive time, source, frame) from recordings, in file order."""
+    for path in paths:
+        with gzip.open(path, 'rt') as f:
+            try:
+                for line in f:
+                    timestamp, source, frame = line.rstrip('\n').split('\t', 2)
+                    yield float(timestamp), source, frame
+            except (EOFError, zlib.error, ValueError):
+                # The process died mid-write; everything before this point is intact
+                continue
@@ -0,0 +1,271 @@
+"""Replay recorded websocket frames through the bot against a local mock exchange.
+
+Market frames from ``recorder.FrameRecorder`` files are fed to
+``main.on_message`` as if they came off the socket, at the recorded pace,
+N times faster, or as fast as the handlers keep up (``--speed 0``). REST calls
+go to ``MockExchange``, which fills market orders at the latest streamed
+price, triggers stop orders when the price crosses them and reports fills
+back through user-data style events, so the account cache and the stop-order
+bookkeeping run their real code paths.
+
+Usage:
+
+    python replay.py recordings/frames-*.gz [--speed 0] [--balance 1000] [--orders orders.csv]
+
+At ``--speed 0`` the reported frame rate is the bot's maximum sustainable
+message rate on this machine.
+"""
+import argparse
+import asyncio
+import csv
+import itertools
+import os
+import time
+from decimal import Decimal
+from typing import Callable, Dict, Optional
+
+from recorder import read_frames
+
+
+class MockExchange:
+    """Stand-in for the ``futures_*`` methods of AsyncClient used by the bot.
+
+    One-way positions, USDT margin, market and STOP_MARKET orders only.
+    Market orders fill completely at ``price_of(symbol)`` with a taker fee.
+    """
+
+    def __init__(self, price_of: Callable[[str], Optional[float]], balance: float = 1000.0,
+                 fee_rate: float = 0.0004, on_event: Optional[Callable[[dict], None]] = None):
+        self.price_of = price_of
+        self.balance = balance
+        self.fee_rate = fee_rate
+        self.on_event = on_event
+        self.response = None  # AsyncClient keeps the last HTTP response here
+        self.now = time.time()  # Set to the recorded time of each frame by the replay driver
+        self.positions: Dict[str, list] = {}  # symbol -> [amount, entry price]
+        self.open_orders: Dict[int, dict] = {}
+        self.orders: Dict[int, dict] = {}
+        self.fills = []
+        self._order_ids = itertools.count(1)
+
+    # ------------------------------------------------------------------
+    # Account endpoints
+    # ------------------------------------------------------------------
+    async def futures_account_balance(self, **params):
+        return [{'asset': 'USDT', 'balance': str(self.balance)}]
+
+    async def futures_position_information(self, **params):
+        return [self._position_info(symbol) for symbol in self.positions]
+
+    async def futures_get_open_orders(self, **params):
+        return [order for order in self.open_orders.values()
+                if 'symbol' not in params or order['symbol'] == params['symbol']]
+
+    async def futures_symbol_ticker(self, symbol, **params):
+        return {'symbol': symbol, 'price': str(self.price_of(symbol) or 0)}
+
+    async def futures_exchange_info(self, **params):
+        return {'symbols': []}
+
+    async def futures_klines(self, **params):
+        return []  # Indicators warm up from the replayed stream
+
+    async def futures_change_leverage(self, symbol, leverage, **params):
+        return {'symbol': symbol, 'leverage': leverage}
+
+    async def futures_change_margin_type(self, symbol, marginType, **params):
+        return {'code': 200, 'msg': 'success'}
+
+    async def futures_stream_get_listen_key(self, **params):
+        return 'replay'
+
+    async def futures_stream_keepalive(self, **params):
+        return {}
+
+    # ------------------------------------------------------------------
+    # Orders
+    # ------------------------------------------------------------------
+    async def futures_create_order(self, symbol, side, type, quantity, **params):
+        order = {
+            'orderId': next(self._order_ids),
+            'clientOrderId': params.get('newClientOrderId', ''),
+            'symbol': symbol,
+            'side': side,
+            'type': type,
+            'origQty': str(quantity),
+            'stopPrice': str(params.get('stopPrice', '0')),
+            'reduceOnly': bool(params.get('reduceOnly')),
+            'status': 'NEW',
+            'executedQty': '0',
+            'avgPrice': '0',
+        }
+        self.orders[order['orderId']] = order
+        if type == 'STOP_MARKET':
+            self.open_orders[order['orderId']] = order
+            self._emit_order(order)
+        else:
+            self._fill(order, Decimal(str(quantity)), self.price_of(symbol))
+        return dict(order)
+
+    async def futures_cancel_order(self, symbol, orderId, **params):
+        order = self.open_orders.pop(int(orderId), None)
+        if order is not None:
+            order['status'] = 'CANCELED'
+            self._emit_order(order)
+        return order or {}
+
+    async def futures_get_order(self, symbol, orderId=None, origClientOrderId=None, **params):
+        for order in self.orders.values():
+            if order['orderId'] == orderId or order['clientOrderId'] == origClientOrderId:
+                return dict(order)
+        return {}
+
+    def check_stops(self) -> None:
+        """Trigger stop orders the latest price has crossed."""
+        for order in list(self.open_orders.values()):
+            price = self.price_of(order['symbol'])
+            if price is None:
+                continue
+            stop = float(order['stopPrice'])
+            if (order['side'] == 'SELL' and price <= stop) or (order['side'] == 'BUY' and price >= stop):
+                del self.open_orders[order['orderId']]
+                amount = self.positions.get(order['symbol'], [Decimal('0')])[0]
+                quantity = min(Decimal(order['origQty']), abs(amount))
+                closes = (amount > 0) == (order['side'] == 'SELL')
+                if not quantity or (order['reduceOnly'] and not closes):
+                    order['status'] = 'EXPIRED'
+                    self._emit_order(order)
+                    continue
+                self._fill(order, quantity, price)
+
+    def _fill(self, order: dict, quantity: Decimal, price: Optional[float]) -> None:
+        if not price:
+            order['status'] = 'REJECTED'
+            self._emit_order(order)
+            return
+        symbol = order['symbol']
+        position = self.positions.setdefault(symbol, [Decimal('0'), 0.0])
+        signed = quantity if order['side'] == 'BUY' else -quantity
+        amount, entry = position
+        if amount and (amount > 0) != (signed > 0):
+            # Realise PnL on the part that reduces the position
+            closed = min(abs(amount), quantity)
+            direction = 1 if amount > 0 else -1
+            self.balance += float(closed) * (price - entry) * direction
+        new_amount = amount + signed
+        if not new_amount:
+            entry = 0.0
+        elif not amount or (amount > 0) != (new_amount > 0):
+            entry = price
+        elif (amount > 0) == (signed > 0):
+            entry = (float(amount) * entry + float(signed) * price) / float(new_amount)
+        position[0], position[1] = new_amount, entry
+        self.balance -= float(quantity) * price * self.fee_rate
+
+        order.update(status='FILLED', executedQty=str(quantity), avgPrice=str(price))
+        self.fills.append({'time': self.now, 'order_id': order['orderId'], 'symbol': symbol,
+                           'side': order['side'], 'type': order['type'], 'quantity': str(quantity),
+                           'price': price, 'position': str(new_amount), 'balance': round(self.balance, 8)})
+        self._emit_order(order)
+        self._emit_account(symbol)
+
+    def _position_info(self, symbol: str) -> dict:
+        amount, entry = self.positions[symbol]
+        price = self.price_of(symbol) or entry
+        return {'symbol': symbol, 'positionAmt': str(amount), 'entryPrice': str(entry),
+                'unRealizedProfit': str(float(amount) * (price - entry)), 'positionSide': 'BOTH'}
+
+    def _emit_order(self, order: dict) -> None:
+        if self.on_event is None:
+            return
+        self.on_event({
+            'e': 'ORDER_TRADE_UPDATE', 'E': int(self.now * 1000),
+            'o': {'s': order['symbol'], 'c': order['clientOrderId'], 'S': order['side'], 'o': order['type'],
+                  'q': order['origQty'], 'sp': order['stopPrice'], 'ap': order['avgPrice'],
+                  'X': order['status'], 'i': order['orderId'], 'z': order['executedQty'], 'ps': 'BOTH'},
+        })
+
+    def _emit_account(self, symbol: str) -> None:
+        if self.on_event is None:
+            return
+        info = self._position_info(symbol)
+        self.on_event({
+            'e': 'ACCOUNT_UPDATE', 'E': int(self.now * 1000),
+            'a': {'B': [{'a': 'USDT', 'wb': str(self.balance)}],
+                  'P': [{'s': symbol, 'pa': info['positionAmt'], 'ep': info['entryPrice'],
+                         'up': info['unRealizedProfit'], 'ps': 'BOTH'}]},
+        })
+
+
+async def replay(paths, speed: float = 0.0, balance: float = 1000.0, fee_rate: float = 0.0004) -> dict:
+    """Feed recorded market frames to the bot's handlers; returns run statistics."""
+    import main
+
+    exchange = MockExchange(main.account_state.price, balance, fee_rate, main.account_state.apply_event)
+    main.client = exchange
+    await main.refresh_account_state()
+
+    frames = 0
+    max_behind = 0.0
+    first_recorded = started = None
+    for recorded_at, source, frame in read_frames(paths):
+        if source != 'market':
+            continue  # The mock exchange is the account; recorded account events don't apply
+        if speed > 0:
+            if first_recorded is None:
+                first_recorded, started = recorded_at, time.perf_counter()
+            due = started + (recorded_at - first_recorded) / speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                max_behind = max(max_behind, -delay)
+        elif started is None:
+            started = time.perf_counter()
+        exchange.now = recorded_at
+        await main.on_message(frame)
+        exchange.check_stops()
+        frames += 1
+    elapsed = time.perf_counter() - started if started is not None else 0.0
+
+    return {
+        'frames': frames,
+        'elapsed_s': elapsed,
+        'frames_per_s': frames / elapsed if elapsed else 0.0,
+        'max_behind_s': max_behind,
+        'fills': exchange.fills,
+        'final_balance': exchange.balance,
+        'positions': {symbol: str(position[0]) for symbol, position in exchange.positions.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded websocket frames against a mock exchange")
+    parser.add_argument('paths', nargs='+', help="recording files, replayed in the order given")
+    parser.add_argument('--speed', type=float, default=0.0, help="1 = recorded pace, N = N times faster, 0 = max")
+    parser.add_argument('--balance', type=float, default=1000.0, help="initial USDT balance")
+    parser.add_argument('--fee-rate', type=float, default=0.0004)
+    parser.add_argument('--orders', help="write the simulated fills to this CSV")
+    args = parser.parse_args()
+
+    # Keep the replay's log away from the live bot's, and quiet enough not to dominate the timing
+    os.environ.setdefault('LOG_FILE', 'replay.log')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    result = asyncio.run(replay(args.paths, args.speed, args.balance, args.fee_rate))
+
+    print(f"Replayed {result['frames']:,} frames in {result['elapsed_s']:.2f}s "
+          f"({result['frames_per_s']:,.0f} frames/s)")
+    if args.speed > 0:
+        print(f"  fell behind schedule by up to {result['max_behind_s'] * 1000:.1f} ms")
+    print(f"  {len(result['fills'])} fills, final balance {result['final_balance']:.2f} USDT, "
+          f"positions {result['positions']}")
+    if args.orders:
+        with open(args.orders, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=['time', 'order_id', 'symbol', 'side', 'type',
+                                                   'quantity', 'price', 'position', 'balance'])
+            writer.writeheader()
+            writer.writerows(result['fills'])
+
+
+if __name__ == '__main__':
+    main()
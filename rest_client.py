@@ -0,0 +1,253 @@
+"""Rate-limit-aware wrapper around the futures REST methods of ``AsyncClient``.
+
+Every ``client.futures_*`` call goes through :class:`RateLimitedClient`, which
+
+* keeps a local count of request weight and order count per window, corrected
+  from the ``X-MBX-USED-WEIGHT-1M`` / ``X-MBX-ORDER-COUNT-*`` response headers;
+* lets reads use only part of the weight budget, so orders and cancels still
+  go out when status queries have used up their share;
+* backs off with jitter on 429 / 418 / -1003, honouring ``Retry-After``, and
+  holds every other request until the block has passed;
+* retries idempotent reads on network errors, never orders;
+* collapses identical reads that are already in flight into one request.
+
+Method names and arguments are the same as on ``AsyncClient``. The client
+itself can be created lazily, on the first request, from an async factory.
+"""
+import asyncio
+import logging
+import random
+import time
+
+from typing import Awaitable, Callable, Optional
+
+import aiohttp
+
+from metrics import REGISTRY
+
+REST_SECONDS = REGISTRY.histogram('bot_rest_request_seconds', "Binance REST call latency", ('endpoint',))
+REST_ERRORS = REGISTRY.counter('bot_rest_errors_total', "Binance REST errors", ('endpoint', 'code'))
+REST_COALESCED = REGISTRY.counter('bot_rest_coalesced_total', "Reads served by an identical request in flight",
+                                  ('endpoint',))
+USED_WEIGHT = REGISTRY.gauge('bot_rest_used_weight', "Request weight used in the current minute")
+ORDER_COUNT = REGISTRY.gauge('bot_rest_order_count_10s', "Orders sent in the current 10 second window")
+
+# Request weights of the futures endpoints we call; anything else counts as 1
+ENDPOINT_WEIGHTS = {
+    'futures_account_balance': 5,
+    'futures_position_information': 5,
+    'futures_account': 5,
+    'futures_exchange_info': 1,
+}
+
+# Orders and cancels, which are never held back for reads
+ORDER_METHODS = {'futures_create_order', 'futures_cancel_order', 'futures_cancel_all_open_orders',
+                 'futures_get_order'}
+
+# Idempotent reads; safe to retry after a network error and to share between callers
+READ_METHODS = {'futures_klines', 'futures_account_balance', 'futures_position_information',
+                'futures_account', 'futures_get_open_orders', 'futures_symbol_ticker',
+                'futures_exchange_info', 'futures_get_order', 'futures_order_book',
+                'futures_mark_price'}
+
+
+class RateLimitError(Exception):
+    """Raised instead of waiting out a ban longer than ``max_wait``."""
+
+
+def request_weight(method: str, params: dict) -> int:
+    if method == 'futures_klines':
+        limit = int(params.get('limit', 500))
+        return 1 if limit < 100 else 2 if limit < 500 else 5 if limit <= 1000 else 10
+    if method == 'futures_order_book':
+        limit = int(params.get('limit', 500))
+        return 2 if limit <= 50 else 5 if limit <= 100 else 10 if limit <= 500 else 20
+    if method == 'futures_get_open_orders':
+        return 1 if 'symbol' in params else 40
+    if method == 'futures_symbol_ticker':
+        return 1 if 'symbol' in params else 2
+    return ENDPOINT_WEIGHTS.get(method, 1)
+
+
+class RateLimitedClient:
+    """Wraps an ``AsyncClient``; ``futures_*`` attributes become rate-limited calls.
+
+    Pass either the client or ``factory``, a coroutine function that builds
+    it when the first request is made.
+    """
+
+    def __init__(self, client=None, weight_limit: int = 2400, order_limit_10s: int = 300,
+                 order_limit_1m: int = 1200, order_reserve: float = 0.2, max_retries: int = 4,
+                 max_wait: float = 30.0, factory: Optional[Callable[[], Awaitable]] = None):
+        if client is None and factory is None:
+            raise ValueError("RateLimitedClient needs a client or a factory")
+        self._client = client
+        self._factory = factory
+        self._creating: Optional[asyncio.Task] = None
+        self.weight_limit = weight_limit
+        self.order_limit_10s = order_limit_10s
+        self.order_limit_1m = order_limit_1m
+        self.read_weight_limit = int(weight_limit * (1 - order_reserve))
+        self.max_retries = max_retries
+        self.max_wait = max_wait
+
+        self.used_weight = 0
+        self.orders_10s = 0
+        self.orders_1m = 0
+        self._minute = 0
+        self._ten_seconds = 0
+        self._blocked_until = 0.0
+        self._in_flight = {}
+
+    def __getattr__(self, name):
+        if name.startswith('futures_'):
+            async def call(**params):
+                return await self.request(name, **params)
+            return call
+        if self._client is None:
+            raise AttributeError(f"{name} is not available before the client is created")
+        return getattr(self._client, name)
+
+    def start_creating(self) -> None:
+        """Begin creating the client in the background, ahead of the first request."""
+        if self._client is None and self._creating is None:
+            self._creating = asyncio.ensure_future(self._factory())
+
+    async def get_client(self):
+        """The wrapped client, created on first use; concurrent first callers share one creation."""
+        if self._client is None:
+            self.start_creating()
+            try:
+                self._client = await asyncio.shield(self._creating)
+            except Exception:
+                self._creating = None  # Let the next request try again
+                raise
+        return self._client
+
+    async def close_connection(self) -> None:
+        if self._client is not None:
+            await self._client.close_connection()
+
+    async def request(self, method: str, **params):
+        if method not in READ_METHODS:
+            return await self._send(method, params)
+        try:
+            key = (method, tuple(sorted(params.items())))
+            hash(key)
+        except TypeError:
+            return await self._send(method, params)
+
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._send(method, params))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            REST_COALESCED.labels(method).inc()
+        # One caller being cancelled must not cancel the request for the others
+        return await asyncio.shield(task)
+
+    async def _send(self, method: str, params: dict):
+        # python-binance is already loaded by the time a client exists, so this is a cheap lookup
+        from binance.exceptions import BinanceAPIException, BinanceRequestException
+
+        client = await self.get_client()
+        is_order = method in ORDER_METHODS
+        weight = request_weight(method, params)
+        call = getattr(client, method)
+        for attempt in range(self.max_retries + 1):
+            await self._wait_for_capacity(weight, method == 'futures_create_order', is_order)
+            started = time.perf_counter()
+            try:
+                result = await call(**params)
+            except BinanceAPIException as e:
+                REST_ERRORS.labels(method, str(e.code or e.status_code)).inc()
+                self._update_from_headers(getattr(e, 'response', None))
+                if e.status_code not in (418, 429) and e.code != -1003:
+                    raise
+                # Rejected before execution, so even orders are safe to resend
+                delay = self._retry_after(e, attempt)
+                self._blocked_until = max(self._blocked_until, time.time() + delay)
+                logging.warning("%s rate limited (%s), backing off %.1fs", method, e.status_code, delay)
+                if attempt == self.max_retries or delay > self.max_wait:
+                    raise
+                continue
+            except (BinanceRequestException, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                REST_ERRORS.labels(method, type(e).__name__).inc()
+                if method not in READ_METHODS or attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+            REST_SECONDS.labels(method).observe(time.perf_counter() - started)
+            self._update_from_headers(getattr(client, 'response', None))
+            return result
+
+    async def _wait_for_capacity(self, weight: int, counts_as_order: bool, is_order: bool) -> None:
+        while True:
+            now = time.time()
+            if now < self._blocked_until:
+                wait = self._blocked_until - now
+                if wait > self.max_wait:
+                    raise RateLimitError(f"REST requests blocked for another {wait:.0f}s")
+                await asyncio.sleep(wait)
+                continue
+            self._roll_windows(now)
+
+            limit = self.weight_limit if is_order else self.read_weight_limit
+            if self.used_weight + weight > limit:
+                wait = 60 - now % 60
+            elif counts_as_order and self.orders_10s >= self.order_limit_10s:
+                wait = 10 - now % 10
+            elif counts_as_order and self.orders_1m >= self.order_limit_1m:
+                wait = 60 - now % 60
+            else:
+                self.used_weight += weight
+                if counts_as_order:
+                    self.orders_10s += 1
+                    self.orders_1m += 1
+                    ORDER_COUNT.set(self.orders_10s)
+                USED_WEIGHT.set(self.used_weight)
+                return
+            # Spread the requests that were held back over the start of the next window
+            await asyncio.sleep(wait + random.uniform(0, 0.5))
+
+    def _roll_windows(self, now: float) -> None:
+        minute = int(now // 60)
+        if minute != self._minute:
+            self._minute = minute
+            self.used_weight = 0
+            self.orders_1m = 0
+        ten_seconds = int(now // 10)
+        if ten_seconds != self._ten_seconds:
+            self._ten_seconds = ten_seconds
+            self.orders_10s = 0
+
+    def _update_from_headers(self, response) -> None:
+        """Take the exchange's own counts where they are higher than ours."""
+        headers = getattr(response, 'headers', None)
+        if not headers:
+            return
+        self._roll_windows(time.time())
+        # aiohttp headers are case-insensitive
+        weight = headers.get('X-MBX-USED-WEIGHT-1M')
+        if weight is not None:
+            self.used_weight = max(self.used_weight, int(weight))
+            USED_WEIGHT.set(self.used_weight)
+        orders = headers.get('X-MBX-ORDER-COUNT-10S')
+        if orders is not None:
+            self.orders_10s = max(self.orders_10s, int(orders))
+            ORDER_COUNT.set(self.orders_10s)
+        orders = headers.get('X-MBX-ORDER-COUNT-1M')
+        if orders is not None:
+            self.orders_1m = max(self.orders_1m, int(orders))
+
+    def _retry_after(self, error, attempt: int) -> float:
+        headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+        try:
+            return float(headers['Retry-After']) + random.uniform(0, 0.5)
+        except (KeyError, ValueError):
+            return self._backoff(attempt)
+
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        return min(30, 0.5 * 2 ** attempt) * (0.5 + random.random())
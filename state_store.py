@@ -0,0 +1,138 @@
+"""Crash-safe persistence of strategy state for warm restarts.
+
+State lives in an SQLite database in WAL mode. Every closed candle, signal
+change and stop-loss order is appended to a journal as it happens, which
+costs one small write per event. After ``snapshot_every`` journal entries
+the full state is written as a snapshot and the journal is cleared, in one
+transaction. Loading applies the snapshot and then replays the journal, so
+a crash at any point restores to the last recorded event.
+"""
+import json
+import logging
+import sqlite3
+from typing import Dict, Iterable, Set
+
+from candles import Candle
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS journal (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL
+);
+"""
+
+
+class StateStore:
+    """Snapshot plus journal of per-stream strategy state and open stop-loss orders.
+
+    ``strategies`` is the StrategyRegistry being persisted. Stop orders are
+    kept per symbol as a set of order ids in ``stop_orders``, so a warm start
+    can adopt the ones still protecting a position and cancel the rest.
+    """
+
+    def __init__(self, path: str, strategies, snapshot_every: int = 500):
+        self.path = path
+        self.strategies = strategies
+        self.snapshot_every = snapshot_every
+        self.stop_orders: Dict[str, Set[int]] = {}
+        # Autocommit mode: each journal append is its own short transaction
+        self._db = sqlite3.connect(path, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        # With WAL, NORMAL survives a process crash and skips the fsync on every commit
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(SCHEMA)
+        self._journal_entries = self._db.execute('SELECT COUNT(*) FROM journal').fetchone()[0]
+
+    # ------------------------------------------------------------------
+    # Restore
+    # ------------------------------------------------------------------
+    def load(self) -> int:
+        """Restore every known strategy from disk; returns how many had saved state."""
+        restored = set()
+        for key, value in self._db.execute('SELECT key, value FROM snapshots'):
+            if key == 'stop_orders':
+                self.stop_orders = {symbol: set(ids) for symbol, ids in json.loads(value).items()}
+                continue
+            strategy = self.strategies.get(key)
+            if strategy is not None:
+                strategy.restore(json.loads(value))
+                restored.add(key)
+
+        for kind, key, value in self._db.execute('SELECT kind, key, value FROM journal ORDER BY seq'):
+            value = json.loads(value)
+            if kind == 'stop':
+                self.stop_orders.setdefault(key, set()).add(value)
+            elif kind == 'stop_done':
+                self.stop_orders.get(key, set()).discard(value)
+            else:
+                strategy = self.strategies.get(key)
+                if strategy is None:
+                    continue  # Pair removed from the configuration
+                if kind == 'candle':
+                    strategy.apply_closed_candle(Candle(*value, closed=True))
+                elif kind == 'signal':
+                    strategy.last_signal = value
+                restored.add(key)
+        return len(restored)
+
+    # ------------------------------------------------------------------
+    # Journal
+    # ------------------------------------------------------------------
+    def record_candle(self, strategy, candle: Candle) -> None:
+        self._append('candle', strategy.stream, [candle.open_time, candle.close_time, candle.open,
+                                                 candle.high, candle.low, candle.close, candle.volume])
+
+    def record_signal(self, strategy) -> None:
+        self._append('signal', strategy.stream, strategy.last_signal)
+
+    def record_stop(self, symbol: str, order_id: int) -> None:
+        self.stop_orders.setdefault(symbol, set()).add(order_id)
+        self._append('stop', symbol, order_id)
+
+    def forget_stop(self, symbol: str, order_id: int) -> None:
+        if order_id in self.stop_orders.get(symbol, ()):
+            self.stop_orders[symbol].discard(order_id)
+            self._append('stop_done', symbol, order_id)
+
+    def prune_stops(self, open_order_ids: Iterable[int]) -> None:
+        """Forget stops that are no longer open on the exchange (filled, cancelled or expired)."""
+        open_order_ids = set(open_order_ids)
+        for symbol, order_ids in list(self.stop_orders.items()):
+            for order_id in order_ids - open_order_ids:
+                self.forget_stop(symbol, order_id)
+
+    def _append(self, kind: str, key: str, value) -> None:
+        try:
+            self._db.execute('INSERT INTO journal (kind, key, value) VALUES (?, ?, ?)',
+                             (kind, key, json.dumps(value)))
+            self._journal_entries += 1
+            if self._journal_entries >= self.snapshot_every:
+                self.snapshot()
+        except sqlite3.Error as e:
+            # Losing persistence must never stop trading
+            logging.error(f"Error writing state journal: {e}")
+
+    # ------------------------------------------------------------------
+    # Snapshots
+    # ------------------------------------------------------------------
+    def snapshot(self) -> None:
+        """Write the full state and clear the journal atomically."""
+        rows = [(strategy.stream, json.dumps(strategy.snapshot())) for strategy in self.strategies]
+        rows.append(('stop_orders', json.dumps({symbol: sorted(ids) for symbol, ids in self.stop_orders.items()})))
+        with self._db:
+            self._db.execute('BEGIN')
+            self._db.executemany('INSERT OR REPLACE INTO snapshots (key, value) VALUES (?, ?)', rows)
+            self._db.execute('DELETE FROM journal')
+        self._journal_entries = 0
+
+    def close(self) -> None:
+        try:
+            self.snapshot()
+        finally:
+            self._db.close()
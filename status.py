@@ -0,0 +1,70 @@
+"""Shared account status snapshot for the Telegram handlers.
+
+Rendering reads only the in-memory account state, which the user-data stream
+keeps current, so handlers never wait on REST in the normal case. The
+rendered message is cached for a couple of seconds, so a burst of Refresh
+presses renders once. Only when the account state can no longer be trusted
+(stream down and the last REST seed too old) is a REST refresh started, and
+every caller shares that one refresh.
+"""
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Optional
+
+
+class StatusSnapshot:
+    """Rendered status message with a short TTL and coalesced refreshes.
+
+    ``render`` builds the message; ``is_fresh`` reports whether the data it
+    reads is current; ``refresh`` reloads that data. Callers wait for a
+    refresh at most ``max_wait`` seconds and otherwise get the last known
+    state, while the refresh carries on in the background.
+    """
+
+    def __init__(self, render: Callable[[], str], is_fresh: Callable[[], bool],
+                 refresh: Callable[[], Awaitable], ttl: float = 2.0, max_wait: float = 3.0):
+        self.render = render
+        self.is_fresh = is_fresh
+        self.refresh = refresh
+        self.ttl = ttl
+        self.max_wait = max_wait
+        self._message: Optional[str] = None
+        self._rendered_at = 0.0
+        self._refreshed_at = 0.0
+        self._refresh_task: Optional[asyncio.Task] = None
+
+        # Accounting
+        self.hits = 0
+        self.renders = 0
+        self.refreshes = 0
+
+    async def get(self) -> str:
+        if not self.is_fresh():
+            await self._wait_for_refresh()
+        # A message rendered before the latest refresh finished shows outdated data
+        if (self._message is not None and self._rendered_at >= self._refreshed_at
+                and time.monotonic() - self._rendered_at < self.ttl):
+            self.hits += 1
+            return self._message
+
+        self._message = self.render()
+        self._rendered_at = time.monotonic()
+        self.renders += 1
+        return self._message
+
+    async def _wait_for_refresh(self) -> None:
+        if self._refresh_task is None or self._refresh_task.done():
+            self.refreshes += 1
+            self._refresh_task = asyncio.create_task(self.refresh())
+            self._refresh_task.add_done_callback(self._on_refreshed)
+        try:
+            # Shielded, so a caller giving up does not cancel the refresh for everyone else
+            await asyncio.wait_for(asyncio.shield(self._refresh_task), self.max_wait)
+        except asyncio.TimeoutError:
+            logging.warning("Status refresh still running, showing last known account state")
+        except Exception as e:
+            logging.error(f"Error refreshing status: {e}")
+
+    def _on_refreshed(self, task: asyncio.Task) -> None:
+        self._refreshed_at = time.monotonic()
@@ -0,0 +1,135 @@
+"""Per (symbol, timeframe) strategy state and the registry that routes streams to it."""
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from candles import Candle, CandleAggregator
+from indicators import MovingAverageEngine
+
+
+class SymbolStrategy:
+    """Settings and live state for one moving-average strategy."""
+
+    def __init__(self, symbol: str, timeframe: str, short_window: int = 7, long_window: int = 30,
+                 leverage: int = 10, stop_loss_percentage: float = 2,
+                 account_usage_percentage: float = 95, warmup_candles: Optional[int] = None):
+        self.symbol = symbol.upper()
+        self.timeframe = timeframe
+        self.short_window = short_window
+        self.long_window = long_window
+        self.leverage = leverage
+        self.stop_loss_percentage = stop_loss_percentage
+        self.account_usage_percentage = account_usage_percentage
+        self.warmup_candles = warmup_candles or long_window
+
+        self.candles = CandleAggregator()
+        self.indicators = MovingAverageEngine(short_window, long_window)
+        self.last_signal: Optional[str] = None  # 'long', 'short', or None
+
+    @property
+    def stream(self) -> str:
+        """Stream name as used in combined-stream URLs and payloads."""
+        return f"{self.symbol.lower()}@kline_{self.timeframe}"
+
+    def snapshot(self) -> dict:
+        """State needed for a warm restart, as plain JSON-able values."""
+        last = self.candles.last_closed
+        return {
+            'closes': self.indicators.prices.to_list(),
+            'last_closed': [last.open_time, last.close_time, last.open, last.high, last.low,
+                            last.close, last.volume] if last else None,
+            'last_signal': self.last_signal,
+        }
+
+    def restore(self, state: dict) -> None:
+        """Load a ``snapshot()``; price history too short for the current windows is dropped."""
+        self.last_signal = state.get('last_signal')
+        if len(state.get('closes') or ()) < self.long_window or not state.get('last_closed'):
+            return  # Let the REST warm-up load a full window instead
+        self.indicators.reset()
+        self.indicators.extend(state['closes'])
+        self.candles = CandleAggregator()
+        self.candles.commit(Candle(*state['last_closed'], closed=True))
+
+    def reset(self) -> None:
+        """Drop the price history, e.g. when it cannot be brought up to date."""
+        self.indicators.reset()
+        self.candles = CandleAggregator()
+
+    def apply_closed_candle(self, candle: Candle) -> bool:
+        """Commit a bar closed outside the stream and feed it to the indicators; False if not newer."""
+        if not self.candles.commit(candle):
+            return False
+        self.indicators.update(candle.close)
+        return True
+
+    def __repr__(self):
+        return f"SymbolStrategy({self.symbol} {self.timeframe} {self.short_window}/{self.long_window})"
+
+
+class StrategyRegistry:
+    """Strategies keyed by their kline stream name."""
+
+    def __init__(self, strategies: Iterable[SymbolStrategy] = ()):
+        self._by_stream: Dict[str, SymbolStrategy] = {}
+        for strategy in strategies:
+            self.add(strategy)
+
+    @classmethod
+    def from_config(cls, configs: Iterable[dict], **defaults) -> 'StrategyRegistry':
+        """One strategy per config entry, each entry overriding ``defaults``.
+
+        A default ``account_usage_percentage`` is the share of the balance for
+        all pairs together, split evenly between the entries that don't set
+        their own, so the pairs never size from more than the whole balance.
+        """
+        configs = list(configs)
+        total_usage = defaults.pop('account_usage_percentage', None)
+        if total_usage is not None:
+            own = [config['account_usage_percentage'] for config in configs if 'account_usage_percentage' in config]
+            if len(own) < len(configs):
+                share = (total_usage - sum(own)) / (len(configs) - len(own))
+                if share <= 0:
+                    raise ValueError(f"Pairs with their own account usage already take {sum(own)}% of the balance")
+                defaults['account_usage_percentage'] = share
+        registry = cls(SymbolStrategy(**{**defaults, **config}) for config in configs)
+        committed = sum(strategy.account_usage_percentage for strategy in registry)
+        if committed > 100:
+            raise ValueError(f"Pairs use {committed}% of the account balance together, more than 100%")
+        return registry
+
+    def add(self, strategy: SymbolStrategy) -> None:
+        # Positions are per symbol in one-way mode, so two timeframes of a symbol would reverse
+        # each other's trades and cancel each other's stops
+        for existing in self:
+            if existing.symbol == strategy.symbol:
+                raise ValueError(f"{strategy.symbol} is already traded on {existing.timeframe}; "
+                                 "each symbol can have one strategy")
+        self._by_stream[strategy.stream] = strategy
+
+    def get(self, stream: str) -> Optional[SymbolStrategy]:
+        return self._by_stream.get(stream)
+
+    def __iter__(self) -> Iterator[SymbolStrategy]:
+        return iter(self._by_stream.values())
+
+    def __len__(self) -> int:
+        return len(self._by_stream)
+
+    @property
+    def streams(self) -> List[str]:
+        return list(self._by_stream)
+
+    @property
+    def symbols(self) -> List[str]:
+        """Distinct symbols, in configuration order."""
+        return list(dict.fromkeys(strategy.symbol for strategy in self))
+
+    def for_symbol(self, symbol: str) -> List[SymbolStrategy]:
+        return [strategy for strategy in self if strategy.symbol == symbol]
+
+    @property
+    def mark_price_streams(self) -> List[str]:
+        """One 1-second mark price stream per symbol, for marking positions in /status."""
+        return [f"{symbol.lower()}@markPrice@1s" for symbol in self.symbols]
+
+    def combined_stream_url(self, base_url: str = 'wss://fstream.binance.com', extra_streams: Iterable[str] = ()) -> str:
+        return f"{base_url}/stream?streams={'/'.join(self.streams + list(extra_streams))}"
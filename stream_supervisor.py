@@ -0,0 +1,223 @@
+"""Supervised market data websocket with backoff and gap-free rotation.
+
+Binance closes every websocket after 24 hours. ``StreamSupervisor`` rotates
+the connection before that: it opens a standby connection next to the
+current one, and closes the old one only once the standby delivers data.
+While both are open, frames arrive twice, so frames are de-duplicated per
+stream by exchange event time before they are handed on. Failed connections
+are retried with exponential backoff and jitter.
+"""
+import asyncio
+import logging
+import random
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+import aiohttp
+
+from frame_queue import stream_key
+
+EVENT_TIME_MARKER = '"E":'
+
+
+def event_time(frame: str) -> Optional[int]:
+    """Exchange event time (ms) of a frame, read without parsing the JSON."""
+    start = frame.find(EVENT_TIME_MARKER)
+    if start < 0:
+        return None
+    start += len(EVENT_TIME_MARKER)
+    end = start
+    while end < len(frame) and frame[end].isdigit():
+        end += 1
+    return int(frame[start:end]) if end > start else None
+
+
+class Backoff:
+    """Exponential backoff with jitter: each delay is drawn from [d/2, d], d doubling up to ``cap``."""
+
+    def __init__(self, base: float = 1.0, cap: float = 60.0):
+        self.base = base
+        self.cap = cap
+        self.attempt = 0
+
+    def next(self) -> float:
+        delay = min(self.cap, self.base * 2 ** self.attempt)
+        self.attempt += 1
+        return random.uniform(delay / 2, delay)
+
+    def reset(self) -> None:
+        self.attempt = 0
+
+
+class FrameDeduplicator:
+    """Drops frames an overlapping connection already delivered.
+
+    Pushes on one stream carry increasing event times, so any frame not newer
+    than the last one passed for its stream is a duplicate. Frames without a
+    stream or event time (subscription replies) always pass.
+    """
+
+    def __init__(self):
+        self._last: Dict[str, int] = {}
+        self.duplicates = 0
+
+    def is_new(self, frame: str) -> bool:
+        stream = stream_key(frame)
+        if stream is None:
+            return True
+        timestamp = event_time(frame)
+        if timestamp is None:
+            return True
+        if timestamp <= self._last.get(stream, -1):
+            self.duplicates += 1
+            return False
+        self._last[stream] = timestamp
+        return True
+
+
+class _Connection:
+    __slots__ = ('ws', 'task', 'opened_at', 'first_frame')
+
+    def __init__(self, ws):
+        self.ws = ws
+        self.task: Optional[asyncio.Task] = None
+        self.opened_at = time.monotonic()
+        self.first_frame = asyncio.Event()
+
+
+class StreamSupervisor:
+    """Keeps one combined-stream websocket delivering frames to ``on_frame``.
+
+    ``on_connect`` runs after a connection is opened from scratch (not after
+    a rotation, which leaves no gap), e.g. to backfill candles missed while
+    disconnected. ``on_disconnect(reason, delay)`` is told why a connection
+    was lost and how long until the next attempt. A connection with no
+    frames for ``timeout`` seconds is treated as dead.
+    """
+
+    def __init__(self, session: aiohttp.ClientSession, url: str, on_frame: Callable[[str], None],
+                 on_connect: Optional[Callable[[], Awaitable]] = None,
+                 on_disconnect: Optional[Callable[[str, float], None]] = None,
+                 timeout: float = 60.0, heartbeat: float = 20.0, max_age: float = 23 * 3600,
+                 standby_timeout: float = 30.0, backoff: Optional[Backoff] = None):
+        self.session = session
+        self.url = url
+        self.on_frame = on_frame
+        self.on_connect = on_connect
+        self.on_disconnect = on_disconnect
+        self.timeout = timeout
+        self.heartbeat = heartbeat
+        self.max_age = max_age
+        self.standby_timeout = standby_timeout
+        self.backoff = backoff or Backoff()
+        self.dedup = FrameDeduplicator()
+
+        # Accounting
+        self.connects = 0
+        self.rotations = 0
+        self.disconnects = 0
+
+    async def run(self) -> None:
+        current: Optional[_Connection] = None
+        try:
+            while True:
+                if current is None:
+                    current = await self._connect()
+                remaining = current.opened_at + self.max_age - time.monotonic()
+                done, _ = await asyncio.wait([current.task], timeout=max(remaining, 0))
+                if done:
+                    reason = self._close_reason(current)
+                    await self._close(current)
+                    current = None
+                    self.disconnects += 1
+                    delay = self.backoff.next()
+                    logging.warning(f"Market data stream lost ({reason}), reconnecting in {delay:.1f}s")
+                    if self.on_disconnect is not None:
+                        self.on_disconnect(reason, delay)
+                    await asyncio.sleep(delay)
+                else:
+                    current = await self._rotate(current)
+        finally:
+            if current is not None:
+                await self._close(current)
+
+    async def _connect(self) -> _Connection:
+        """Open a connection from scratch, retrying with backoff until one is up."""
+        while True:
+            try:
+                connection = await self._open()
+            except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+                delay = self.backoff.next()
+                logging.error(f"Market data connect failed: {e}, retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+            if self.on_connect is not None:
+                # Pushes wait in the socket until the gap is filled, so they apply on top of it
+                await self.on_connect()
+            self._start(connection)
+            return connection
+
+    async def _rotate(self, current: _Connection) -> _Connection:
+        """Replace an ageing connection by a standby that is already delivering frames."""
+        standby = None
+        try:
+            standby = await self._open()
+            self._start(standby)
+            await asyncio.wait_for(standby.first_frame.wait(), self.standby_timeout)
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError, asyncio.CancelledError) as e:
+            if standby is not None:
+                await self._close(standby)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            # Keep the current connection and try again shortly
+            current.opened_at = time.monotonic() - self.max_age + self.backoff.next()
+            logging.warning(f"Standby connection failed: {e}, keeping the current one")
+            return current
+        await self._close(current)
+        self.rotations += 1
+        logging.info("Market data connection rotated ahead of the 24h limit")
+        return standby
+
+    async def _open(self) -> _Connection:
+        ws = await self.session.ws_connect(self.url, heartbeat=self.heartbeat)
+        self.connects += 1
+        return _Connection(ws)
+
+    def _start(self, connection: _Connection) -> None:
+        connection.task = asyncio.create_task(self._read(connection))
+
+    async def _read(self, connection: _Connection) -> str:
+        """Pump frames until the connection ends; returns why it ended."""
+        ws = connection.ws
+        while True:
+            msg = await ws.receive(timeout=self.timeout)
+            if msg.type == aiohttp.WSMsgType.TEXT:
+                if not connection.first_frame.is_set():
+                    connection.first_frame.set()
+                    self.backoff.reset()
+                if self.dedup.is_new(msg.data):
+                    self.on_frame(msg.data)
+            elif msg.type == aiohttp.WSMsgType.ERROR:
+                return f"error: {ws.exception()}"
+            elif msg.type in (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSING, aiohttp.WSMsgType.CLOSED):
+                return "closed by server"
+
+    @staticmethod
+    def _close_reason(connection: _Connection) -> str:
+        if connection.task.cancelled():
+            return "cancelled"
+        error = connection.task.exception()
+        if isinstance(error, asyncio.TimeoutError):
+            return "no data received"
+        if error is not None:
+            return f"error: {error}"
+        return connection.task.result()
+
+    async def _close(self, connection: _Connection) -> None:
+        if connection.task is not None:
+            connection.task.cancel()
+            try:
+                await connection.task
+            except (asyncio.CancelledError, Exception):
+                pass
+        await connection.ws.close()
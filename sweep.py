@@ -0,0 +1,221 @@
+"""Grid or random search of strategy parameters across symbols.
+
+Each kline file is loaded once, written to a ``.npy`` cache together with its
+price prefix sums, and memory-mapped read-only by every worker process, so the
+price data is shared rather than copied per process. Work is split into one
+task per (symbol, short window, long window); a task computes its signals once
+and reuses them for every stop-loss setting, and each stop-loss simulation for
+every leverage. Workers keep the moving averages they have computed, so a
+window shared by many tasks is only calculated once per worker.
+
+Results are appended to a CSV as they finish and the current leaders printed
+as the sweep goes.
+
+Usage:
+
+    python sweep.py LTCUSDT-1m.csv BTCUSDT-1m.csv --short 5:20 --long 20:100:5 \\
+        --stop-loss 1,2,3 --leverage 5,10 [--random 500] [--workers 8]
+"""
+import argparse
+import csv
+import heapq
+import itertools
+import os
+import random
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+
+import numpy as np
+
+from backtest import (PRICE_COLUMNS, load_klines, price_prefix_sums, rolling_mean,
+                      score_trades, signals_from_averages, simulate_trades)
+
+RESULT_FIELDS = ['symbol', 'short_window', 'long_window', 'stop_loss', 'leverage', 'trades',
+                 'stop_losses', 'win_rate_pct', 'return_pct', 'max_drawdown_pct', 'final_balance']
+
+# Memory-mapped data, opened once per worker process
+_klines = {}
+_prefixes = {}
+_settings = {}
+
+
+def parse_values(spec: str, cast=float) -> list:
+    """``"1,2,3"`` -> [1, 2, 3]; ``"5:20:5"`` -> [5, 10, 15, 20] (stop is inclusive, step defaults to 1)."""
+    if ':' in spec:
+        parts = [cast(part) for part in spec.split(':')]
+        start, stop = parts[0], parts[1]
+        step = parts[2] if len(parts) > 2 else 1
+        values = []
+        value = start
+        while value <= stop + 1e-9:
+            values.append(cast(round(value, 10)))
+            value += step
+        return values
+    return [cast(part) for part in spec.split(',')]
+
+
+def symbol_name(path: str) -> str:
+    """Label for a kline input: the file name without extension, or ``LTCUSDT-5m`` for a store directory."""
+    path = os.path.normpath(path)
+    if os.path.isdir(path):
+        # Store directories are <root>/<SYMBOL>/<timeframe>, so the last directory alone is ambiguous
+        timeframe = os.path.basename(path)
+        symbol = os.path.basename(os.path.dirname(os.path.abspath(path)))
+        return f"{symbol}-{timeframe}"
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def cache_symbol(path: str, cache_dir: str, symbol: str) -> None:
+    """Write a kline file's price columns and prefix sums to ``.npy`` files named after ``symbol``."""
+    klines = load_klines(path)
+    np.save(os.path.join(cache_dir, f"{symbol}.klines.npy"), np.vstack([klines[name] for name in PRICE_COLUMNS]))
+    np.save(os.path.join(cache_dir, f"{symbol}.prefix.npy"), price_prefix_sums(klines['close']))
+
+
+def init_worker(cache_dir: str, symbols: list, settings: dict) -> None:
+    for symbol in symbols:
+        # Plain ndarray views of the maps skip np.memmap's per-slice subclass overhead
+        columns = np.asarray(np.load(os.path.join(cache_dir, f"{symbol}.klines.npy"), mmap_mode='r'))
+        _klines[symbol] = {name: columns[row] for row, name in enumerate(PRICE_COLUMNS)}
+        _prefixes[symbol] = np.asarray(np.load(os.path.join(cache_dir, f"{symbol}.prefix.npy"), mmap_mode='r'))
+    _settings.update(settings)
+
+
+@lru_cache(maxsize=256)
+def cached_mean(symbol: str, window: int) -> np.ndarray:
+    return rolling_mean(_prefixes[symbol], window)
+
+
+def run_task(symbol: str, short_window: int, long_window: int, stop_losses: list, leverages: list) -> list:
+    """Backtest every stop-loss/leverage pair for one MA combination."""
+    klines = _klines[symbol]
+    bars = len(klines['close'])
+    signals = signals_from_averages(cached_mean(symbol, short_window), cached_mean(symbol, long_window), long_window)
+    rows = []
+    for stop_loss in stop_losses:
+        trades = simulate_trades(klines, signals, stop_loss, _settings['slippage_bps'])
+        for leverage in leverages:
+            summary = score_trades(trades, bars, leverage, _settings['account_usage'],
+                                   _settings['fee_rate'], _settings['balance']).summary()
+            rows.append({
+                'symbol': symbol,
+                'short_window': short_window,
+                'long_window': long_window,
+                'stop_loss': stop_loss,
+                'leverage': leverage,
+                **{field: summary[field] for field in RESULT_FIELDS[5:]},
+            })
+    return rows
+
+
+def build_tasks(symbols, shorts, longs, stop_losses, leverages, samples=None, seed=None):
+    """Group configurations into (symbol, short, long, stop losses, leverages) tasks.
+
+    With ``samples`` set, that many configurations are drawn at random from
+    the grid instead of running all of it.
+    """
+    combos = [(symbol, short, long) for symbol in symbols for short in shorts for long in longs if short < long]
+    if samples is None:
+        return [(symbol, short, long, stop_losses, leverages) for symbol, short, long in combos]
+
+    rng = random.Random(seed)
+    grouped = {}
+    for _ in range(samples):
+        symbol, short, long = rng.choice(combos)
+        grouped.setdefault((symbol, short, long), set()).add((rng.choice(stop_losses), rng.choice(leverages)))
+    tasks = []
+    for (symbol, short, long), pairs in grouped.items():
+        # Run each sampled stop loss with the leverages sampled alongside it
+        by_stop = {}
+        for stop_loss, leverage in pairs:
+            by_stop.setdefault(stop_loss, []).append(leverage)
+        for stop_loss, stop_leverages in by_stop.items():
+            tasks.append((symbol, short, long, [stop_loss], sorted(stop_leverages)))
+    return tasks
+
+
+def print_leaders(leaders, metric, top):
+    print(f"\nTop {min(top, len(leaders))} by {metric}:")
+    print(f"  {'symbol':<14}{'short':>6}{'long':>6}{'stop%':>7}{'lev':>5}{'trades':>8}{'ret%':>10}{'maxdd%':>9}")
+    for _, _, row in sorted(leaders, reverse=True):
+        print(f"  {row['symbol']:<14}{row['short_window']:>6}{row['long_window']:>6}{row['stop_loss']:>7g}"
+              f"{row['leverage']:>5g}{row['trades']:>8}{row['return_pct']:>10.2f}{row['max_drawdown_pct']:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel parameter sweep of the moving-average strategy")
+    parser.add_argument('paths', nargs='+', help="kline CSV/Parquet files or kline store directories, one per symbol")
+    parser.add_argument('--short', default='5:15', help="short windows, list or start:stop[:step]")
+    parser.add_argument('--long', default='20:60:5', help="long windows, list or start:stop[:step]")
+    parser.add_argument('--stop-loss', default='1,2,3', help="stop loss percentages")
+    parser.add_argument('--leverage', default='5,10', help="leverage values")
+    parser.add_argument('--random', type=int, metavar='N', help="sample N configurations instead of the full grid")
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--metric', default='return_pct', choices=RESULT_FIELDS[5:])
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--output', default='sweep_results.csv')
+    parser.add_argument('--account-usage', type=float, default=95)
+    parser.add_argument('--fee-rate', type=float, default=0.0004)
+    parser.add_argument('--slippage-bps', type=float, default=1.0)
+    parser.add_argument('--balance', type=float, default=1000.0)
+    args = parser.parse_args()
+
+    symbols = [symbol_name(path) for path in args.paths]
+    duplicates = sorted({symbol for symbol in symbols if symbols.count(symbol) > 1})
+    if duplicates:
+        parser.error(f"several inputs would be labelled {', '.join(duplicates)}; give each input a distinct name")
+
+    settings = {
+        'account_usage': args.account_usage,
+        'fee_rate': args.fee_rate,
+        'slippage_bps': args.slippage_bps,
+        'balance': args.balance,
+    }
+    start = time.perf_counter()
+    cache_dir = tempfile.mkdtemp(prefix='sweep-')
+    try:
+        for path, symbol in zip(args.paths, symbols):
+            cache_symbol(path, cache_dir, symbol)
+        tasks = build_tasks(symbols, parse_values(args.short, int), parse_values(args.long, int),
+                            parse_values(args.stop_loss), parse_values(args.leverage),
+                            args.random, args.seed)
+        total = sum(len(task[3]) * len(task[4]) for task in tasks)
+        print(f"Loaded {len(symbols)} symbol(s) in {time.perf_counter() - start:.1f}s; "
+              f"{total} configurations in {len(tasks)} tasks on {args.workers} workers")
+
+        leaders = []  # Min-heap of (metric, tiebreak, row) holding the current top N
+        done = 0
+        counter = itertools.count()
+        with open(args.output, 'w', newline='') as output, \
+                ProcessPoolExecutor(args.workers, initializer=init_worker,
+                                    initargs=(cache_dir, symbols, settings)) as pool:
+            writer = csv.DictWriter(output, fieldnames=RESULT_FIELDS)
+            writer.writeheader()
+            futures = [pool.submit(run_task, *task) for task in tasks]
+            last_report = time.perf_counter()
+            for future in as_completed(futures):
+                for row in future.result():
+                    writer.writerow(row)
+                    entry = (row[args.metric], next(counter), row)
+                    if len(leaders) < args.top:
+                        heapq.heappush(leaders, entry)
+                    elif entry[0] > leaders[0][0]:
+                        heapq.heapreplace(leaders, entry)
+                    done += 1
+                if time.perf_counter() - last_report > 10:
+                    output.flush()
+                    last_report = time.perf_counter()
+                    print(f"{done}/{total} done, best {args.metric} so far: {max(leaders)[0]:.2f}")
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    print_leaders(leaders, args.metric, args.top)
+    print(f"\n{done} configurations in {time.perf_counter() - start:.1f}s, all results in {args.output}")
+
+
+if __name__ == '__main__':
+    main()